@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+# Indicators computed by /getAnalytics, every indicator is returned unless a subset is requested
+ANALYTICS_METRICS = ["log_return", "volatility", "sma", "ema"]
+
+'''
+Function Description: A helper function utilized to convert rows of (unit, datetime, closing) into a dataframe of closing prices with one
+                      column per unit indexed by datetime. Data points missing for a unit are left as NaN.
+@param rows => List of (unit, datetime, closing) rows ordered by datetime
+@return DataFrame => Dataframe containing the closing prices of every unit
+'''
+
+
+def closing_frame(rows):
+    frame = pd.DataFrame(rows, columns=["unit", "datetime", "closing"])
+    frame["closing"] = frame["closing"].astype(np.float64)
+    return frame.pivot(index="datetime", columns="unit", values="closing").sort_index()
+
+
+'''
+Function Description: Function utilized to compute the indicators of a single closing price series. Every indicator is computed with
+                      vectorized pandas operations over the whole series, so the cost is a handful of passes over the loaded range.
+                      The log return is the natural logarithm of the ratio of each closing price to the previous one, the volatility
+                      is the standard deviation of the log returns over the last window data points, while sma and ema are the simple
+                      and exponential moving averages of the closing prices over window data points. Data points lacking a full window
+                      are returned as NaN.
+@param closing => Series of closing prices indexed by datetime
+@param window => Number of data points of the rolling windows
+@param metrics => List of indicators to be computed, a subset of ANALYTICS_METRICS
+@return DataFrame => Dataframe containing the closing price and every requested indicator indexed by datetime
+'''
+
+
+def compute_indicators(closing, window, metrics=ANALYTICS_METRICS):
+    res = pd.DataFrame({"closing": closing})
+    log_returns = np.log(closing).diff()
+
+    if "log_return" in metrics:
+        res["log_return"] = log_returns
+    if "volatility" in metrics:
+        res["volatility"] = log_returns.rolling(window).std()
+    if "sma" in metrics:
+        res["sma"] = closing.rolling(window).mean()
+    if "ema" in metrics:
+        res["ema"] = closing.ewm(span=window, adjust=False, min_periods=window).mean()
+    return res
+
+
+'''
+Function Description: Function utilized to compute the pairwise correlation of the hourly, daily or weekly log returns of several units.
+                      Returns are aligned on their datetime and each pair is correlated over the data points both units hold.
+@param closing => Dataframe containing the closing prices of every unit, as returned by closing_frame
+@return DataFrame => Correlation matrix with one row and column per unit
+@return int => Number of data points at which every unit holds a log return
+'''
+
+
+def correlation(closing):
+    log_returns = np.log(closing).diff()
+    return (log_returns.corr(), int(log_returns.notna().all(axis=1).sum()))
+
+
+'''
+Function Description: A helper function utilized to convert a numpy array into a list, replacing NaN with None so it is serialized as null.
+@param values => Numpy array of floats
+@return list => List of floats and None
+'''
+
+
+def to_list(values):
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(values), None, values).tolist()
@@ -1,78 +1,582 @@
-from flask import Flask, jsonify
+from datetime import datetime, timezone
+from dotenv import dotenv_values
+from flask import Flask, Response, g, json, jsonify, request, stream_with_context
+from functools import wraps
+from urllib.parse import urlencode
 from apscheduler.schedulers.background import BackgroundScheduler
 from upload_data import UploadData
+from stream_ingest import StreamIngest, BINANCE_STREAM_URL
 from fetch_data import GetData
+from db_pool import get_pool
+from bootstrap import Bootstrap
+from response_cache import ResponseCache
+from recent import RecentEntries
+from rollups import RESOLUTIONS, RESOLUTION_HOURS, lttb
+from analytics import ANALYTICS_METRICS, closing_frame, compute_indicators, correlation, to_list
+from columnar import COLUMNAR_JSON_MIMETYPE, ARROW_STREAM_MIMETYPE, select_list, to_columnar_json, to_arrow
+from metrics import REGISTRY, SIZE_BUCKETS, Counter, Gauge, Histogram
+
+import itertools
+import numpy as np
+import psycopg2
+import time
 
 app = Flask(__name__)
 fd = UploadData()
 gd = GetData()
 
-# Upon initialization of the system, the first request will first fetch all kline data from the 
-# Binance API using the default date specified in ./env/units.py
-@app.before_first_request
-def update_db():
-    fd.run()
+# Serialized responses of the read endpoints are cached until the next ingest commits new data
+api_env = dotenv_values("./env/api.env")
+cache = ResponseCache(
+    max_entries=int(api_env.get("CACHE_MAX_ENTRIES") or 128),
+    max_bytes=int(api_env.get("CACHE_MAX_BYTES") or 128 * 1024 * 1024))
+fd.add_commit_listener(cache.invalidate)
+
+# The latest entries of every unit are held in memory to serve /getRecent without querying the database, warmed at start up and
+# appended to after every ingest commit
+recent = RecentEntries(capacity=int(api_env.get("RECENT_ENTRIES") or 168))
+fd.add_commit_listener(recent.append)
+
+# In stream mode closed klines are ingested as they are pushed by the Binance kline stream instead of polling the REST API hourly
+INGEST_MODE = api_env.get("INGEST_MODE") or "poll"
+stream = None
+if INGEST_MODE == "stream":
+    stream = StreamIngest(
+        fd,
+        base_url=api_env.get("BINANCE_STREAM_URL") or BINANCE_STREAM_URL,
+        flush_interval=float(api_env.get("STREAM_FLUSH_INTERVAL") or 2))
+
+# Request metrics recorded for every route, together with the state of the connection pool and the response cache
+REQUEST_SECONDS = Histogram(
+    "byenance_http_request_seconds", "Duration of requests until the response headers are sent", labels=("route", "method", "status"))
+RESPONSE_BYTES = Histogram(
+    "byenance_http_response_bytes", "Size of response bodies, streamed responses are excluded", labels=("route",), buckets=SIZE_BUCKETS)
+POOL_CONNECTIONS = Gauge(
+    "byenance_db_pool_connections", "Connections of the shared connection pool per state", labels=("state",),
+    function=lambda: {(state,): get_pool().stats()[state] for state in ("in_use", "idle", "size", "max_size")})
+POOL_EVENTS = Counter(
+    "byenance_db_pool_events_total", "Cumulative connection pool events", labels=("event",),
+    function=lambda: {(event,): get_pool().stats()[event] for event in ("checkouts", "created", "discarded", "timeouts")})
+POOL_WAIT_SECONDS = Counter(
+    "byenance_db_pool_wait_seconds_total", "Cumulative time spent waiting for a pooled connection",
+    function=lambda: {(): get_pool().stats()["wait_time_total"]})
+CACHE_EVENTS = Counter(
+    "byenance_response_cache_events_total", "Cumulative response cache events", labels=("event",),
+    function=lambda: {(event,): cache.stats()[event] for event in ("hits", "misses", "evictions", "invalidations")})
+CACHE_BYTES = Gauge(
+    "byenance_response_cache_bytes", "Size of the cached response bodies",
+    function=lambda: {(): cache.stats()["bytes"]})
+RECENT_HELD = Gauge(
+    "byenance_recent_entries", "Entries of each unit held in memory for /getRecent", labels=("unit",),
+    function=lambda: {(unit,): count for unit, count in recent.stats().items()})
+
+# Upon initialization of the system, a background thread applies pending database migrations and then fetches all kline data
+# from the Binance API using the default date specified in ./env/units.py, so requests are served while the backfill runs.
+# In stream mode the stream fetches the missing kline data itself once connected. The recent entries are warmed beforehand
+# so entries committed by the ingest are appended. A new database is first loaded from the snapshot in SNAPSHOT_DIR, so only the
+# hours following the snapshot are fetched. Progress is reported by the /health and /ready endpoints.
+bootstrap = Bootstrap(fd, gd, recent, stream=stream, snapshot_dir=api_env.get("SNAPSHOT_DIR") or "./snapshot")
 
 def hourly_db_update():
     fd.run()
 
-# Scheduler Utilized to fetch hourly kline data points from the binance api 
+# Request hooks utilized to record the latency and payload size of every request, labelled by the route rule rather than the
+# requested path so the number of label sets stays bounded
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    started = g.get("request_started")
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                route=route, method=request.method, status=response.status_code)
+    if not response.is_streamed:
+        RESPONSE_BYTES.observe(response.calculate_content_length() or 0, route=route)
+    return response
+
+# Scheduler Utilized to fetch hourly kline data points from the binance api, not needed when the kline stream is used
+# Overdue runs are coalesced into a single run and a run overlapping the bootstrap or another process is skipped by UploadData.run
 scheduler = BackgroundScheduler(daemon=True)
-scheduler.add_job(hourly_db_update, 'interval', minutes=60)
+if stream is None:
+    scheduler.add_job(hourly_db_update, 'interval', minutes=60, max_instances=1, coalesce=True)
 scheduler.start()
+bootstrap.start()
+
+# Media types a read endpoint can respond with, the row based JSON layout is served unless the client prefers a columnar layout
+RESPONSE_MIMETYPES = ["application/json", COLUMNAR_JSON_MIMETYPE, ARROW_STREAM_MIMETYPE]
+
+# Helper utilized to negotiate the media type of a response from the Accept header of the request
+def negotiate_mimetype():
+    return request.accept_mimetypes.best_match(RESPONSE_MIMETYPES, default=RESPONSE_MIMETYPES[0])
+
+# Decorator utilized to serve a read endpoint through the response cache, keyed by the endpoint, its query parameters and the
+# negotiated media type. Every cached response carries an ETag so clients revalidating with If-None-Match receive a 304 without a body.
+# Streamed responses, errors and responses marked with Cache-Control: no-store are never cached.
+def cached(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = negotiate_mimetype() + " " + request.path + "?" + urlencode(sorted(request.args.items(multi=True)))
+        entry = cache.get(key)
+
+        if entry is None:
+            version = cache.current_version()
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed or response.cache_control.no_store:
+                return response
+            entry = cache.set(key, response.get_data(), response.mimetype, version)
+
+        response = Response(entry["body"], mimetype=entry["mimetype"])
+        response.set_etag(entry["etag"])
+        # Clients are asked to revalidate on every use as the data changes with each ingest
+        response.cache_control.no_cache = True
+        response.vary.add("Accept")
+        return response.make_conditional(request)
+    return wrapper
+
+# Helper utilized to build the JSON response of a read endpoint, failed responses are marked so they are never cached
+def json_response(res):
+    response = jsonify(res)
+    if res['status'] != 'success':
+        response.cache_control.no_store = True
+    return response
+
+# Default and maximum number of entries returned in a single page of /getEntries
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+PAGINATION_ARGS = {"unit", "start", "end", "limit", "cursor"}
+STREAM_FORMATS = {"ndjson", "json-stream"}
+
+# Helper utilized to convert a row of the entries table into the dictionary format returned to the client
+def format_entry(d):
+    return {
+        'id': d[0],
+        'unit': d[1],
+        'datetime': d[2],
+        'opening': str(d[3]),
+        'closing': str(d[4]),
+        'interpolated': str(d[5])
+    }
+
+# Helper utilized to convert a row of the rolling_returns table into the dictionary format returned to the client
+def format_return(d):
+    return {
+        'id': d[0],
+        'date': d[1],
+        'opening': str(d[2]),
+        'closing': str(d[3]),
+        'unit': d[4]
+    }
+
+# Helper utilized to stream a full table export instead of building the whole response in memory.
+# format=ndjson emits one JSON object per line, format=json-stream emits the regular response body in chunks.
+# Rows are serialized batch by batch as they arrive from the server side cursor so memory usage stays flat
+# regardless of the size of the table and the first rows are sent immediately.
+# The first batch is read before the response starts so a failing connection or query still returns a failed response.
+# Failures once rows were sent end the body visibly broken, ndjson with a final error line and json-stream without
+# its closing brackets, so a failed export never parses as a complete one.
+def stream_table(table, key, formatter, output_format):
+    batches = gd.stream(table)
+    try:
+        first_batch = next(batches, [])
+    except (Exception, psycopg2.DatabaseError) as error:
+        print(error)
+        return json_response({'status': 'fail'})
+
+    def generate_ndjson():
+        try:
+            for batch in itertools.chain([first_batch], batches):
+                yield "".join(json.dumps(formatter(d)) + "\n" for d in batch)
+        except (Exception, psycopg2.DatabaseError) as error:
+            print(error)
+            yield json.dumps({"error": str(error)}) + "\n"
+        finally:
+            batches.close()
+
+    def generate_json():
+        yield '{"status": "success", "' + key + '": ['
+        try:
+            first = True
+            for batch in itertools.chain([first_batch], batches):
+                if not batch:
+                    continue
+                chunk = ",".join(json.dumps(formatter(d)) for d in batch)
+                yield chunk if first else "," + chunk
+                first = False
+        except (Exception, psycopg2.DatabaseError) as error:
+            print(error)
+            return
+        finally:
+            batches.close()
+        yield "]}"
+
+    if output_format == "ndjson":
+        return Response(stream_with_context(generate_ndjson()), mimetype="application/x-ndjson")
+    return Response(stream_with_context(generate_json()), mimetype="application/json")
+
+# Helper utilized to export a full table in a columnar layout, either a JSON document of parallel arrays or an Arrow IPC stream.
+# Prices are sent as float64 and timestamps as milliseconds since epoch, avoiding the Decimal and string conversions of the row
+# based layout together with the keys repeated in every row. Both layouts are built from the batches of the server side cursor.
+# Arrow streams send every batch as it arrives, failures once the stream started abort the response before its end of stream marker.
+def columnar_table(table, key, mimetype):
+    batches = gd.stream(table, columns=select_list(table))
+    if mimetype == ARROW_STREAM_MIMETYPE:
+        try:
+            first_batch = next(batches, [])
+        except (Exception, psycopg2.DatabaseError) as error:
+            print(error)
+            return json_response({'status': 'fail'})
+
+        def generate_arrow():
+            try:
+                yield from to_arrow(table, itertools.chain([first_batch], batches))
+            finally:
+                batches.close()
+
+        response = Response(stream_with_context(generate_arrow()), mimetype=ARROW_STREAM_MIMETYPE)
+        # Streamed responses bypass the response cache, the negotiated media type is declared here instead
+        response.vary.add("Accept")
+        return response
+
+    try:
+        body = to_columnar_json(table, key, batches)
+    except (Exception, psycopg2.DatabaseError) as error:
+        print(error)
+        return json_response({'status': 'fail'})
+    return Response(body, mimetype=COLUMNAR_JSON_MIMETYPE)
+
+# Helper utilized to parse an optional ISO 8601 datetime query parameter
+def parse_datetime_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError("Invalid " + name + " datetime: " + value)
 
 # Endpoint used to obtain entries stored in the database 
 # entries are defined as each hourly data point found via the Binance API 
+# Supplying any of the unit, start, end, limit or cursor query parameters returns a single page of entries ordered by (unit, datetime)
+# together with a next_cursor which is passed back as the cursor parameter to obtain the following page.
+# Alternatively, format=ndjson or format=json-stream streams every entry for full history exports.
+# Full history requests accepting a columnar media type receive the entries as parallel arrays instead of one object per entry.
 @app.route("/getEntries",  methods=['GET'])
+@cached
 def getEntries():
-    data = gd.run("entries")
+    if request.args.get("format") in STREAM_FORMATS:
+        return stream_table("entries", "entries", format_entry, request.args["format"])
+    mimetype = negotiate_mimetype()
+    if mimetype != RESPONSE_MIMETYPES[0] and PAGINATION_ARGS.isdisjoint(request.args.keys()):
+        return columnar_table("entries", "entries", mimetype)
+
     # Status message utilized to easily identify whether the main algorithm was successful on the client side 
     res = {
         'status': 'fail'
     }
 
-    if data != None:
-        entries = []
+    if PAGINATION_ARGS.isdisjoint(request.args.keys()):
+        data = gd.run("entries")
+        next_key = None
+    else:
+        try:
+            limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+            if limit < 1 or limit > MAX_PAGE_SIZE:
+                raise ValueError("limit must be between 1 and " + str(MAX_PAGE_SIZE))
+            start = parse_datetime_arg("start")
+            end = parse_datetime_arg("end")
+            cursor = request.args.get("cursor")
+            after = gd.decode_cursor(cursor) if cursor else None
+        except ValueError as error:
+            res['error'] = str(error)
+            return jsonify(res), 400
 
+        data, next_key = gd.run_page(
+            limit, unit=request.args.get("unit"), start=start, end=end, after=after)
+        res['next_cursor'] = gd.encode_cursor(next_key) if next_key else None
+
+    if data != None:
         # Data returned are formatted as a list of dictionaries to allow for easy access of data in the web application.
-        for d in data:
-            tmp = {
-                'id': d[0],
-                'unit': d[1],
-                'datetime': d[2],
-                'opening': str(d[3]),
-                'closing': str(d[4]),
-                'interpolated': str(d[5])
-            }
-            entries.append(tmp)
-
-        res['entries'] = entries
+        res['entries'] = [format_entry(d) for d in data]
         res['status'] = 'success'
 
-    return jsonify(res)
+    return json_response(res)
 
 # Endpoint used to obtain daily rolling returns calculated and stored in the database
+# format=ndjson or format=json-stream streams every rolling return for full history exports.
+# Requests accepting a columnar media type receive the rolling returns as parallel arrays instead of one object per return.
 @app.route("/getRollingReturns", methods=['GET'])
+@cached
 def getRollingReturns():
+    if request.args.get("format") in STREAM_FORMATS:
+        return stream_table("rolling_returns", "returns", format_return, request.args["format"])
+    mimetype = negotiate_mimetype()
+    if mimetype != RESPONSE_MIMETYPES[0]:
+        return columnar_table("rolling_returns", "returns", mimetype)
+
     data = gd.run("rolling_returns")
     res = {
         'status': 'fail'
     }
 
     if data != None:
-        returns = []
-
-        for d in data:
-            tmp = {
-                'id': d[0],
-                'date': d[1],
-                'opening': str(d[2]),
-                'closing': str(d[3]),
-                'unit': d[4]
-            }
-            returns.append(tmp)
-
-        res['returns'] = returns
+        res['returns'] = [format_return(d) for d in data]
+        res['status'] = 'success'
+
+    return json_response(res)
+
+# Default and maximum number of data points returned by /getSeries
+DEFAULT_SERIES_POINTS = 1000
+MAX_SERIES_POINTS = 5000
+
+# Helper utilized to convert a row of a series into the dictionary format returned to the client
+def format_point(d):
+    return {
+        'datetime': d[0],
+        'opening': str(d[1]),
+        'closing': str(d[2]),
+        'high': str(d[3]),
+        'low': str(d[4])
+    }
+
+# Endpoint used to obtain the price series of a unit for charts, with a payload bounded by max_points regardless of the history stored
+# resolution=hour, day or week serves the series from the entries table or the daily and weekly rollups, while the default
+# resolution=auto picks the finest resolution fitting within max_points. Series still exceeding max_points, e.g. an explicit
+# hourly resolution over several years, are downsampled on the closing price with the Largest Triangle Three Buckets algorithm.
+@app.route("/getSeries", methods=['GET'])
+@cached
+def getSeries():
+    res = {
+        'status': 'fail'
+    }
+
+    try:
+        unit = request.args.get("unit")
+        if not unit:
+            raise ValueError("unit is required")
+        resolution = request.args.get("resolution", "auto")
+        if resolution != "auto" and resolution not in RESOLUTIONS:
+            raise ValueError("resolution must be one of auto, " + ", ".join(RESOLUTIONS))
+        max_points = int(request.args.get("max_points", DEFAULT_SERIES_POINTS))
+        if max_points < 3 or max_points > MAX_SERIES_POINTS:
+            raise ValueError("max_points must be between 3 and " + str(MAX_SERIES_POINTS))
+        start = parse_datetime_arg("start")
+        end = parse_datetime_arg("end")
+    except ValueError as error:
+        res['error'] = str(error)
+        return jsonify(res), 400
+
+    if resolution == "auto":
+        first, last = gd.get_span(unit, start=start, end=end)
+        resolution = RESOLUTIONS[-1]
+        if first is not None:
+            hours = (last - first).total_seconds() / 3600
+            # The finest resolution whose number of data points over the range fits within the budget
+            resolution = next((r for r in RESOLUTIONS if hours / RESOLUTION_HOURS[r] + 1 <= max_points), resolution)
+
+    data = gd.run_series(unit, resolution, start=start, end=end)
+    if data != None:
+        downsampled = len(data) > max_points
+        if downsampled:
+            x = np.array([d[0].timestamp() for d in data])
+            y = np.array([d[2] for d in data], dtype=np.float64)
+            data = [data[i] for i in lttb(x, y, max_points)]
+
+        res['unit'] = unit
+        res['resolution'] = resolution
+        res['downsampled'] = downsampled
+        res['series'] = [format_point(d) for d in data]
+        res['status'] = 'success'
+
+    return json_response(res)
+
+# Default number of entries returned by /getRecent, the maximum is the number of entries held per unit
+DEFAULT_RECENT_ENTRIES = 24
+
+# Default and maximum number of data points of the rolling windows of /getAnalytics
+DEFAULT_ANALYTICS_WINDOW = 24
+MAX_ANALYTICS_WINDOW = 24 * 365
+
+# Helper utilized to parse the resolution and datetime range shared by the analytics endpoints
+def parse_range_args():
+    resolution = request.args.get("resolution", "hour")
+    if resolution not in RESOLUTIONS:
+        raise ValueError("resolution must be one of " + ", ".join(RESOLUTIONS))
+    return (resolution, parse_datetime_arg("start"), parse_datetime_arg("end"))
+
+# Endpoint used to obtain indicators of a unit computed on the server, so clients never download the raw history to compute them
+# metrics selects any of log_return, volatility, sma and ema (every indicator by default) computed over window data points of the
+# requested resolution between start and end. The prices of the range are loaded once and every indicator is computed vectorially,
+# results are memoized by the response cache until the next ingest commits new data.
+# Requests accepting the columnar JSON media type receive the series as parallel arrays with datetimes in milliseconds since epoch.
+@app.route("/getAnalytics", methods=['GET'])
+@cached
+def getAnalytics():
+    res = {
+        'status': 'fail'
+    }
+
+    try:
+        unit = request.args.get("unit")
+        if not unit:
+            raise ValueError("unit is required")
+        resolution, start, end = parse_range_args()
+        window = int(request.args.get("window", DEFAULT_ANALYTICS_WINDOW))
+        if window < 2 or window > MAX_ANALYTICS_WINDOW:
+            raise ValueError("window must be between 2 and " + str(MAX_ANALYTICS_WINDOW))
+        metrics = request.args.get("metrics", ",".join(ANALYTICS_METRICS)).split(",")
+        if not set(metrics) <= set(ANALYTICS_METRICS):
+            raise ValueError("metrics must be a comma separated list of " + ", ".join(ANALYTICS_METRICS))
+    except ValueError as error:
+        res['error'] = str(error)
+        return jsonify(res), 400
+
+    data = gd.run_closing([unit], resolution, start=start, end=end)
+    if data == None:
+        return json_response(res)
+
+    columns = [name for name in ["closing"] + ANALYTICS_METRICS if name == "closing" or name in metrics]
+    series = compute_indicators(closing_frame(data)[unit], window, metrics) if data else None
+    res['unit'] = unit
+    res['resolution'] = resolution
+    res['window'] = window
+    res['status'] = 'success'
+
+    if request.accept_mimetypes.best_match(RESPONSE_MIMETYPES[:2], default=RESPONSE_MIMETYPES[0]) == COLUMNAR_JSON_MIMETYPE:
+        res['series'] = {name: [] for name in ["datetime"] + columns}
+        if series is not None:
+            res['series']['datetime'] = (series.index.asi8 // 10 ** 6).tolist()
+            res['series'].update({name: to_list(series[name].values) for name in columns})
+        return Response(json.dumps(res), mimetype=COLUMNAR_JSON_MIMETYPE)
+
+    res['series'] = []
+    if series is not None:
+        values = [to_list(series[name].values) for name in columns]
+        res['series'] = [dict(zip(["datetime"] + columns, point)) for point in zip(series.index.to_pydatetime(), *values)]
+    return json_response(res)
+
+# Endpoint used to obtain the correlation matrix of the log returns of several units over the requested resolution and range
+# units is a comma separated list of at least two units, each pair is correlated over the data points both units hold.
+@app.route("/getCorrelation", methods=['GET'])
+@cached
+def getCorrelation():
+    res = {
+        'status': 'fail'
+    }
+
+    try:
+        units = [unit for unit in request.args.get("units", "").split(",") if unit]
+        if len(set(units)) < 2:
+            raise ValueError("units must list at least two units")
+        resolution, start, end = parse_range_args()
+    except ValueError as error:
+        res['error'] = str(error)
+        return jsonify(res), 400
+
+    data = gd.run_closing(units, resolution, start=start, end=end)
+    if data != None:
+        units = sorted(set(units))
+        matrix, observations = correlation(closing_frame(data).reindex(columns=units))
+        res['units'] = units
+        res['resolution'] = resolution
+        res['observations'] = observations
+        res['matrix'] = [to_list(row) for row in matrix.values]
         res['status'] = 'success'
 
+    return json_response(res)
+
+# Endpoint used to obtain the latest entries of a unit, e.g. the last day or week of prices, served from memory
+# limit caps the number of entries returned while start only returns entries at or after the given datetime.
+# Requests accepting the columnar JSON media type receive the entries as parallel arrays with datetimes in milliseconds since epoch.
+@app.route("/getRecent", methods=['GET'])
+def getRecent():
+    res = {
+        'status': 'fail'
+    }
+
+    try:
+        unit = request.args.get("unit")
+        if not unit:
+            raise ValueError("unit is required")
+        limit = int(request.args.get("limit", DEFAULT_RECENT_ENTRIES))
+        if limit < 1 or limit > recent.capacity:
+            raise ValueError("limit must be between 1 and " + str(recent.capacity))
+        start = parse_datetime_arg("start")
+        if start is not None:
+            if start.tzinfo is None:
+                start = start.replace(tzinfo=timezone.utc)
+            start = int(start.timestamp() * 1000)
+    except ValueError as error:
+        res['error'] = str(error)
+        return jsonify(res), 400
+
+    # The buffers are warmed on demand if the database was not reachable at start up
+    if not recent.warmed and not recent.warm(gd):
+        return jsonify(res), 503
+
+    data = recent.get(unit, limit, start=start)
+    if data is None:
+        res['error'] = "Unknown unit: " + unit
+        return jsonify(res), 404
+
+    res['unit'] = unit
+    res['status'] = 'success'
+    if request.accept_mimetypes.best_match(RESPONSE_MIMETYPES[:2], default=RESPONSE_MIMETYPES[0]) == COLUMNAR_JSON_MIMETYPE:
+        res['entries'] = {field: values.tolist() for field, values in data.items()}
+        return Response(json.dumps(res), mimetype=COLUMNAR_JSON_MIMETYPE)
+
+    res['entries'] = [{
+        'datetime': datetime.fromtimestamp(d[0] / 1000, timezone.utc),
+        'opening': str(d[1]),
+        'closing': str(d[2]),
+        'interpolated': str(d[3])
+    } for d in zip(data["datetime"].tolist(), data["opening"].tolist(), data["closing"].tolist(), data["interpolated"].tolist())]
+    return jsonify(res)
+
+# Endpoint used by liveness probes, the process responds as soon as it has started regardless of the backfill
+# Returns the bootstrap phase together with the ingest progress of every unit
+@app.route("/health", methods=['GET'])
+def health():
+    res = {
+        'status': 'success',
+        'bootstrap': bootstrap.status()
+    }
+    return jsonify(res)
+
+# Endpoint used by readiness probes, responds with 503 until migrations are applied and the database is brought up to date
+# Returns the bootstrap phase together with the ingest progress of every unit, e.g. to follow the backfill after a fresh deploy
+@app.route("/ready", methods=['GET'])
+def ready():
+    is_ready = bootstrap.ready()
+    res = {
+        'status': 'success' if is_ready else 'fail',
+        'bootstrap': bootstrap.status()
+    }
+    return jsonify(res), 200 if is_ready else 503
+
+# Endpoint used to monitor the shared database connection pool
+# Returns the number of open, idle and in use connections together with cumulative checkout and wait time metrics
+@app.route("/getPoolStats", methods=['GET'])
+def getPoolStats():
+    res = {
+        'status': 'success',
+        'pool': get_pool().stats()
+    }
+    return jsonify(res)
+
+# Endpoint used to expose the ingest, database and request metrics in the Prometheus text exposition format
+@app.route("/metrics", methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Endpoint used to monitor the response cache
+# Returns the number of cached responses and their size together with cumulative hit, miss and eviction counts
+@app.route("/getCacheStats", methods=['GET'])
+def getCacheStats():
+    res = {
+        'status': 'success',
+        'cache': cache.stats()
+    }
     return jsonify(res)
@@ -0,0 +1,224 @@
+import aiohttp
+import asyncio
+import random
+import time
+
+BINANCE_API_URL = "https://api.binance.com"
+KLINES_PATH = "/api/v3/klines"
+HOUR_MS = 60 * 60 * 1000
+# Maximum number of klines returned by a single request to the klines endpoint
+PAGE_LIMIT = 1000
+
+'''
+Class Description: Exception raised when a page of klines could not be fetched after every retry attempt.
+'''
+
+
+class FetchError(Exception):
+    pass
+
+
+'''
+Class Description: The class is responsible for pacing requests to the Binance API within its request weight limit. The bucket holds
+                   at most one minute worth of weight and is refilled continuously, requests wait until enough weight is available.
+'''
+
+
+class TokenBucket():
+
+    def __init__(self, weight_per_minute):
+        super().__init__()
+        self.capacity = weight_per_minute
+        self.rate = weight_per_minute / 60
+        self.tokens = weight_per_minute
+        self.updated = time.monotonic()
+        self.lock = None
+
+    '''
+    Function Description: Function utilized to wait until the requested weight is available and consume it.
+    @param weight => Request weight to be consumed
+    '''
+
+    async def acquire(self, weight):
+        # The lock is created lazily so it is bound to the event loop the bucket is used in
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens +
+                                  (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                await asyncio.sleep((weight - self.tokens) / self.rate)
+
+    '''
+    Function Description: Function utilized to empty the bucket when the Binance API reports the limit was exceeded,
+                          e.g. because other clients share the same IP address.
+    '''
+
+    def drain(self):
+        self.tokens = 0
+        self.updated = time.monotonic()
+
+
+'''
+Class Description: The class is responsible for fetching hourly klines of many units concurrently. The missing range of each unit is
+                   split into pages of PAGE_LIMIT hours which are requested concurrently, paced by a token bucket shared by every request
+                   and retried with an exponential backoff. The base URL is configurable so a local server can stand in for Binance.
+'''
+
+
+class AsyncKlineFetcher():
+
+    def __init__(self, base_url=BINANCE_API_URL, weight_per_minute=1200, request_weight=2, concurrency=10,
+                 max_retry=5, retry_interval=1, timeout=30):
+        super().__init__()
+        self.base_url = base_url.rstrip("/")
+        self.weight_per_minute = weight_per_minute
+        self.request_weight = request_weight
+        self.concurrency = concurrency
+        self.max_retry = max_retry
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+
+    '''
+    Function Description: A helper function utilized to split a time range into the start and end times of each page request.
+    @param start_ms => Start of the range in milliseconds since epoch
+    @param end_ms => End of the range in milliseconds since epoch
+    @return list => List of (start, end) tuples in milliseconds, each covering at most PAGE_LIMIT hourly klines
+    '''
+
+    def split_range(self, start_ms, end_ms):
+        windows = []
+        window_start = start_ms
+        while window_start <= end_ms:
+            window_end = min(window_start + PAGE_LIMIT * HOUR_MS - 1, end_ms)
+            windows.append((window_start, window_end))
+            window_start = window_end + 1
+        return windows
+
+    '''
+    Function Description: Function utilized to fetch a single page of klines, retrying on connection errors, server errors and rate
+                          limit responses. Rate limit responses honour the Retry-After header returned by Binance.
+    @param session => aiohttp session utilized for the request
+    @param bucket => Token bucket shared by every request
+    @param semaphore => Semaphore bounding the number of requests in flight
+    @param unit => crypto unit to be fetched
+    @param window => (start, end) tuple in milliseconds of the page
+    @return list => List of hourly klines in the page
+    '''
+
+    async def fetch_page(self, session, bucket, semaphore, unit, window):
+        params = {
+            "symbol": unit,
+            "interval": "1h",
+            "startTime": window[0],
+            "endTime": window[1],
+            "limit": PAGE_LIMIT
+        }
+        retry = 0
+
+        while True:
+            await bucket.acquire(self.request_weight)
+            delay = self.retry_interval * (2 ** retry) * (1 + random.random())
+            try:
+                async with semaphore:
+                    async with session.get(self.base_url + KLINES_PATH, params=params) as response:
+                        if response.status == 200:
+                            return await response.json()
+
+                        error = unit + ": HTTP " + str(response.status)
+                        # 429 is returned when the request weight limit is exceeded and 418 once an IP address is banned for it
+                        if response.status in (418, 429):
+                            bucket.drain()
+                            delay = max(delay, float(
+                                response.headers.get("Retry-After", 0)))
+                        elif response.status < 500:
+                            raise FetchError(error + " " + await response.text())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exception:
+                error = unit + ": " + repr(exception)
+
+            retry += 1
+            if retry > self.max_retry:
+                raise FetchError(error)
+            print(error + ", Retry Attempt: " + str(retry) +
+                  " / " + str(self.max_retry))
+            await asyncio.sleep(delay)
+
+    '''
+    Function Description: Function utilized to fetch every kline of a unit within a time range.
+    @param session => aiohttp session utilized for the requests
+    @param bucket => Token bucket shared by every request
+    @param semaphore => Semaphore bounding the number of requests in flight
+    @param unit => crypto unit to be fetched
+    @param start_ms => Start of the range in milliseconds since epoch
+    @param end_ms => End of the range in milliseconds since epoch
+    @return list => List of hourly klines ordered by their open time
+    '''
+
+    async def fetch_unit(self, session, bucket, semaphore, unit, start_ms, end_ms):
+        tasks = [
+            asyncio.ensure_future(self.fetch_page(session, bucket, semaphore, unit, window))
+            for window in self.split_range(start_ms, end_ms)
+        ]
+        try:
+            pages = await asyncio.gather(*tasks)
+        finally:
+            # gather leaves the remaining pages running once a page fails, they are cancelled so a failed unit stops issuing
+            # requests and consuming request weight. Cancelling pages which already completed has no effect.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        klines = []
+        for page in pages:
+            klines.extend(page)
+        return klines
+
+    '''
+    Function Description: Function utilized to fetch the klines of every unit concurrently within a single event loop.
+    @param unit_start_times => Dictionary containing the start time in milliseconds since epoch of each unit
+    @param end_ms => End of the range in milliseconds since epoch
+    @return dictionary => Dictionary containing the klines of each unit, or the exception raised while fetching the unit
+    '''
+
+    async def fetch_all(self, unit_start_times, end_ms):
+        bucket = TokenBucket(self.weight_per_minute)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            units = list(unit_start_times.keys())
+            results = await asyncio.gather(*[
+                self.fetch_unit(session, bucket, semaphore, unit,
+                                unit_start_times[unit], end_ms)
+                for unit in units
+            ], return_exceptions=True)
+        return dict(zip(units, results))
+
+    '''
+    Function Description: Main function utilized to fetch the klines of every unit from its start time up to the current time. Units
+                          which could not be fetched are reported and excluded from the result.
+    @param unit_start_times => Dictionary containing the start time in milliseconds since epoch of each unit
+    @param end_ms => Optional end of the range in milliseconds since epoch, defaults to the current time
+    @return dictionary => Dictionary containing the klines of each unit fetched successfully
+    '''
+
+    def fetch(self, unit_start_times, end_ms=None):
+        if end_ms is None:
+            end_ms = int(time.time() * 1000)
+        if not unit_start_times:
+            return {}
+
+        results = asyncio.run(self.fetch_all(unit_start_times, end_ms))
+        res = {}
+        for unit, klines in results.items():
+            if isinstance(klines, Exception):
+                print(unit + ": " + str(klines))
+            else:
+                res[unit] = klines
+        return res
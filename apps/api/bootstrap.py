@@ -0,0 +1,134 @@
+from datetime import datetime, timezone
+from migrate import run_migrations
+from snapshot import run_snapshot_load
+
+import threading
+
+'''
+Class Description: The class is responsible for preparing the API once it starts, off the request path so every request is served
+                   immediately while a backfill runs. Pending migrations are applied, the recent entries are warmed and the database is
+                   brought up to date by a first ingest run, or by the kline stream catching up in stream mode. Steps which fail, e.g.
+                   because the database is not yet reachable, are retried after retry_interval seconds, doubling on every failure up to
+                   max_retry_interval seconds. A database without entries is first loaded from the snapshot found in snapshot_dir, if
+                   any, so the ingest only catches up from its high water marks. The API is ready once an ingest run brought every unit
+                   which could be ingested up to date, runs skipped as another process is ingesting are retried so readiness reflects a
+                   database which is up to date. Units which failed are reported by status and retried by the following ingest runs.
+'''
+
+
+class Bootstrap():
+
+    def __init__(self, upload, gd, recent, stream=None, snapshot_dir=None, retry_interval=5, max_retry_interval=300):
+        super().__init__()
+        self.upload = upload
+        self.gd = gd
+        self.recent = recent
+        self.stream = stream
+        self.snapshot_dir = snapshot_dir
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        # Current step of the bootstrap, one of pending, migrating, loading, warming, backfilling or ready
+        self.phase = "pending"
+        self.started = None
+        self.finished = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    '''
+    Function Description: A helper function utilized to call a step until it succeeds or the bootstrap is stopped, backing off
+                          exponentially between attempts.
+    @param step => Function returning True once the step succeeded
+    @param backoff => False to call the step every retry_interval seconds, e.g. when it only checks the state of another thread
+    @return boolean => True if the step succeeded, False if the bootstrap was stopped
+    '''
+
+    def retry(self, step, backoff=True):
+        delay = self.retry_interval
+        while not self.stopped.is_set():
+            if step():
+                return True
+            self.stopped.wait(delay)
+            if backoff:
+                delay = min(delay * 2, self.max_retry_interval)
+        return False
+
+    '''
+    Function Description: A helper function utilized to run an ingest, the step succeeds once a run completed even if some units failed.
+    @return boolean => True once an ingest run brought every unit which could be ingested up to date
+    '''
+
+    def backfill(self):
+        self.upload.run()
+        return self.upload.last_run is not None
+
+    '''
+    Function Description: Main function utilized to run every step of the bootstrap, executed by the bootstrap thread.
+    '''
+
+    def run(self):
+        self.started = datetime.now(timezone.utc)
+
+        self.phase = "migrating"
+        if not self.retry(run_migrations):
+            return
+        if self.snapshot_dir:
+            self.phase = "loading"
+            if not self.retry(lambda: run_snapshot_load(self.snapshot_dir)):
+                return
+        self.phase = "warming"
+        # Warming is not retried as /getRecent warms the recent entries on demand
+        self.recent.warm(self.gd)
+
+        self.phase = "backfilling"
+        if self.stream is not None:
+            # The stream catches up from the REST API as soon as it is connected
+            self.stream.start()
+            completed = self.retry(lambda: self.upload.last_run is not None, backoff=False)
+        else:
+            completed = self.retry(self.backfill)
+        if not completed:
+            return
+
+        self.phase = "ready"
+        self.finished = datetime.now(timezone.utc)
+        print("Bootstrap completed in " + str(self.finished - self.started))
+
+    '''
+    Function Description: Function utilized to start the bootstrap in a background thread.
+    '''
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="bootstrap", daemon=True)
+        self.thread.start()
+
+    '''
+    Function Description: Function utilized to stop the bootstrap once its current step returns.
+    @param timeout => Maximum number of seconds to wait for the bootstrap thread
+    '''
+
+    def stop(self, timeout=None):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    '''
+    Function Description: A helper function utilized to identify whether the bootstrap completed.
+    @return boolean => True once the database was brought up to date
+    '''
+
+    def ready(self):
+        return self.phase == "ready"
+
+    '''
+    Function Description: Function utilized to obtain the state of the bootstrap together with the ingest progress of every unit.
+    @return dictionary => Dictionary containing the bootstrap phase, its start and completion time and the ingest progress
+    '''
+
+    def status(self):
+        return {
+            "phase": self.phase,
+            "started": self.started.isoformat() if self.started is not None else None,
+            "finished": self.finished.isoformat() if self.finished is not None else None,
+            "ingest": self.upload.get_progress()
+        }
@@ -0,0 +1,116 @@
+from psycopg2.extras import execute_values
+
+import io
+
+# Frames with at least this many rows are written with COPY, smaller frames such as the hourly increments are written with
+# batched INSERT statements as the fixed cost of a COPY outweighs its benefit for a handful of rows.
+COPY_THRESHOLD = 1000
+# Number of rows sent per INSERT statement when writing with execute_values
+INSERT_PAGE_SIZE = 1000
+
+'''
+Function Description: A helper function utilized to build the ON CONFLICT clause turning an INSERT into an idempotent upsert. Rows
+                      conflicting with a stored row on the key columns overwrite its remaining columns, so rewriting rows, e.g. when
+                      an ingest is retried or a snapshot is loaded, never creates duplicates.
+@param columns => List of columns written
+@param key => List of columns forming the unique key of the table
+@return String => ON CONFLICT clause, an empty string if no key is given
+'''
+
+
+def conflict_clause(columns, key):
+    if not key:
+        return ""
+    updates = [column + " = EXCLUDED." + column for column in columns if column not in key]
+    if not updates:
+        return " ON CONFLICT (" + ",".join(key) + ") DO NOTHING"
+    return " ON CONFLICT (" + ",".join(key) + ") DO UPDATE SET " + ", ".join(updates)
+
+
+'''
+Function Description: Function utilized to bulk load rows serialized as CSV with a single COPY FROM STDIN statement, avoiding a round trip
+                      per row. As COPY cannot resolve conflicts, rows are copied into a temporary staging table and upserted from it when
+                      a key is given.
+@param cursor => Cursor object utilized for SQL statement executions.
+@param table => Table name the rows are loaded into
+@param columns => List of the table columns in the order of the CSV fields
+@param buffer => File like object containing the CSV rows without a header
+@param key => Optional list of columns forming the unique key the rows are upserted on
+'''
+
+
+def copy_csv(cursor, table, columns, buffer, key=None):
+    # Table and column names are never user specifiable, only the row values are streamed from the buffer
+    target = table
+    if key:
+        target = "staging_" + table
+        cursor.execute("CREATE TEMPORARY TABLE %s ON COMMIT DROP AS SELECT %s FROM %s WITH NO DATA" % (
+            target, ','.join(columns), table))
+
+    statement = "COPY %s (%s) FROM STDIN WITH (FORMAT csv)" % (
+        target, ','.join(columns))
+    cursor.copy_expert(statement, buffer)
+
+    if key:
+        cursor.execute("INSERT INTO %s (%s) SELECT %s FROM %s%s" % (
+            table, ','.join(columns), ','.join(columns), target, conflict_clause(columns, key)))
+        # The staging table is dropped straight away so further frames can be loaded within the same transaction
+        cursor.execute("DROP TABLE " + target)
+
+
+'''
+Function Description: Function utilized to bulk load a dataframe with a single COPY statement. The dataframe is serialized as CSV into an
+                      in-memory buffer which is streamed to the database.
+@param cursor => Cursor object utilized for SQL statement executions.
+@param table => Table name the rows are loaded into
+@param columns => List of dataframe columns loaded, the dataframe column names must match the table column names
+@param frame => Dataframe containing the rows to be loaded
+@param key => Optional list of columns forming the unique key the rows are upserted on
+'''
+
+
+def copy_frame(cursor, table, columns, frame, key=None):
+    buffer = io.StringIO()
+    frame.to_csv(buffer, columns=columns, header=False, index=False)
+    buffer.seek(0)
+    copy_csv(cursor, table, columns, buffer, key=key)
+
+
+'''
+Function Description: Function utilized to insert a dataframe with batched multi row INSERT statements.
+@param cursor => Cursor object utilized for SQL statement executions.
+@param table => Table name the rows are inserted into
+@param columns => List of dataframe columns inserted, the dataframe column names must match the table column names
+@param frame => Dataframe containing the rows to be inserted
+@param template => Optional row template, e.g. to cast values, defaults to one placeholder per column
+@param key => Optional list of columns forming the unique key the rows are upserted on
+'''
+
+
+def insert_frame(cursor, table, columns, frame, template=None, key=None):
+    statement = "INSERT INTO %s (%s) VALUES %%s%s" % (
+        table, ','.join(columns), conflict_clause(columns, key))
+    rows = frame[columns].itertuples(index=False, name=None)
+    execute_values(cursor, statement, rows,
+                   template=template, page_size=INSERT_PAGE_SIZE)
+
+
+'''
+Function Description: Main function utilized to write a dataframe to the database, choosing COPY for bulk loads such as the initial
+                      backfill and batched INSERT statements for small increments.
+@param cursor => Cursor object utilized for SQL statement executions.
+@param table => Table name the rows are written into
+@param columns => List of dataframe columns written, the dataframe column names must match the table column names
+@param frame => Dataframe containing the rows to be written
+@param template => Optional row template utilized by the INSERT fallback
+@param key => Optional list of columns forming the unique key the rows are upserted on, rows are inserted as is otherwise
+'''
+
+
+def write_frame(cursor, table, columns, frame, template=None, key=None):
+    if len(frame) == 0:
+        return
+    if len(frame) >= COPY_THRESHOLD:
+        copy_frame(cursor, table, columns, frame, key=key)
+    else:
+        insert_frame(cursor, table, columns, frame, template=template, key=key)
@@ -0,0 +1,149 @@
+from flask import json
+
+import pyarrow as pa
+
+# Media types negotiated through the Accept header for full table exports in a columnar layout
+COLUMNAR_JSON_MIMETYPE = "application/vnd.byenance.columnar+json"
+ARROW_STREAM_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+# Columns of each table in the columnar layouts as (name, select expression, arrow type). Prices are cast to float8 and timestamps to
+# milliseconds since epoch by the database itself, so rows arrive as plain floats and integers instead of Decimal and datetime objects.
+# Column names match the keys of the row based JSON responses.
+TABLE_COLUMNS = {
+    "entries": [
+        ("id", "id", pa.int64()),
+        ("unit", "unit", pa.string()),
+        ("datetime", "(extract(epoch FROM datetime) * 1000)::bigint", pa.timestamp("ms", tz="UTC")),
+        ("opening", "opening::float8", pa.float64()),
+        ("closing", "closing::float8", pa.float64()),
+        ("interpolated", "interpolated", pa.bool_())
+    ],
+    "rolling_returns": [
+        ("id", "rid", pa.int64()),
+        ("date", "(extract(epoch FROM date::timestamp) * 1000)::bigint", pa.timestamp("ms", tz="UTC")),
+        ("opening", "opening::float8", pa.float64()),
+        ("closing", "closing::float8", pa.float64()),
+        ("unit", "unit", pa.string())
+    ]
+}
+
+'''
+Function Description: A helper function utilized to obtain the select list reading a table in the columnar layout.
+@param table => Table name to be queried on the database
+@return String => Comma separated select expressions of the table columns
+'''
+
+
+def select_list(table):
+    return ", ".join(expression for _, expression, _ in TABLE_COLUMNS[table])
+
+
+'''
+Class Description: The class is responsible for collecting the bytes written by an Arrow IPC writer, so the stream can be sent to the
+                   client message by message rather than being written to a single buffer holding the whole table.
+'''
+
+
+class ChunkSink():
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    # File methods called by the Arrow writer, bytes are kept in memory until drained
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    '''
+    Function Description: Function utilized to obtain the bytes written since the previous call.
+    @return bytes => Bytes written by the writer
+    '''
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+'''
+Function Description: A helper function utilized to obtain the Arrow schema of a table in the columnar layout.
+@param table => Table name the rows are read from
+@return Schema => Arrow schema with one field per column
+'''
+
+
+def table_schema(table):
+    return pa.schema([(name, arrow_type) for name, _, arrow_type in TABLE_COLUMNS[table]])
+
+
+'''
+Function Description: A helper function utilized to convert a batch of rows read with select_list into a record batch. Rows are transposed
+                      column by column, so the Python objects of a single cursor batch are held at a time.
+@param schema => Arrow schema of the table, see table_schema
+@param rows => List of row tuples read with select_list
+@return RecordBatch => Record batch holding the rows
+'''
+
+
+def record_batch(schema, rows):
+    columns = zip(*rows) if rows else [()] * len(schema)
+    arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+'''
+Function Description: Function utilized to serialize batches of rows read with select_list as a JSON document of parallel arrays, one
+                      per column, instead of one object per row repeating every key. Every cursor batch is converted into a record
+                      batch as it arrives, so the rows are held as Arrow arrays rather than Python objects until the document is
+                      written column by column. Timestamps are written as milliseconds since epoch.
+@param table => Table name the rows are read from
+@param key => Key of the columns object in the response body, matching the key of the row based JSON response
+@param batches => Iterable of row batches read with select_list, e.g. GetData.stream
+@return bytes => Serialized response body
+'''
+
+
+def to_columnar_json(table, key, batches):
+    schema = table_schema(table)
+    rows = pa.Table.from_batches([record_batch(schema, batch) for batch in batches], schema=schema)
+    columns = []
+    for field, column in zip(schema, rows.columns):
+        if pa.types.is_timestamp(field.type):
+            column = column.cast(pa.int64())
+        columns.append(json.dumps(field.name) + ": " + json.dumps(column.to_pylist()))
+    return ('{"status": "success", ' + json.dumps(key) + ": {" + ", ".join(columns) + "}}").encode("utf-8")
+
+
+'''
+Function Description: Generator utilized to serialize batches of rows read with select_list as an Arrow IPC stream. Every cursor batch
+                      is written as one record batch and sent as soon as it is serialized, keeping memory usage bounded by the batch
+                      size rather than the size of the table.
+@param table => Table name the rows are read from
+@param batches => Iterable of row batches read with select_list, e.g. GetData.stream
+@return generator => Yields the bytes of the Arrow IPC stream, starting with the schema and ending with the end of stream marker
+'''
+
+
+def to_arrow(table, batches):
+    schema = table_schema(table)
+    sink = ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            if not batch:
+                continue
+            writer.write_batch(record_batch(schema, batch))
+            yield sink.drain()
+    yield sink.drain()
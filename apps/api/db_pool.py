@@ -0,0 +1,271 @@
+from dotenv import dotenv_values
+
+import psycopg2
+import threading
+import time
+
+'''
+Class Description: Exception raised when a connection could not be checked out of the pool, either because the database
+                   could not be reached or because no connection was returned to the pool within the configured wait time.
+'''
+
+
+class PoolError(Exception):
+    pass
+
+
+'''
+Class Description: The class is responsible for sharing a bounded set of PostgreSQL connections between the API workers and the
+                   ingest job. Connections are reused across requests so a request only pays for its query rather than a new TCP
+                   and authentication handshake. Connections idle for longer than the health check interval are verified before
+                   being handed out and callers wait at most the configured timeout when every connection is in use.
+'''
+
+
+class ConnectionPool():
+
+    def __init__(self, db_env, min_size=1, max_size=10, timeout=10, health_check_interval=30):
+        super().__init__()
+        self.db_env = db_env
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self.condition = threading.Condition()
+        # Idle connections are stored with the time they were returned to the pool
+        self.idle = []
+        self.in_use = set()
+        # Number of open connections, including connections currently being opened
+        self.size = 0
+        self.warmed = False
+        self.metrics = {
+            "checkouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "timeouts": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0
+        }
+
+    '''
+    Function Description: A helper function utilized to open a new connection to the PostgreSQL instance
+    @return Connection => A new connection object, a PoolError is raised if the database could not be reached
+    '''
+
+    def create(self):
+        try:
+            conn = psycopg2.connect(**self.db_env)
+        except (Exception, psycopg2.DatabaseError) as error:
+            raise PoolError(str(error))
+        with self.condition:
+            self.metrics["created"] += 1
+        return conn
+
+    '''
+    Function Description: A helper function utilized to verify an idle connection before it is handed out. Connections which have
+                          been used recently are assumed to be healthy to avoid an additional round trip on every checkout.
+    @param conn => Connection object to be verified
+    @param idle_since => Time the connection was returned to the pool
+    @return boolean => True if the connection can be handed out
+    '''
+
+    def is_healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except (Exception, psycopg2.DatabaseError):
+            return False
+
+    '''
+    Function Description: A helper function utilized to close a connection which is no longer reusable.
+    @param conn => Connection object to be closed
+    '''
+
+    def discard(self, conn):
+        try:
+            conn.close()
+        except (Exception, psycopg2.DatabaseError):
+            pass
+        with self.condition:
+            self.metrics["discarded"] += 1
+            self.size -= 1
+            self.condition.notify()
+
+    '''
+    Function Description: Main function utilized to check a connection out of the pool. A new connection is opened when no idle
+                          connection is available and the pool has not reached its maximum size, otherwise the caller waits for a
+                          connection to be returned. Connections are opened and health checked outside of the pool lock so a slow
+                          handshake does not block callers which could be served by an idle connection.
+    @return Connection => A connection object which must be returned with putconn, a PoolError is raised if no connection
+                          became available within the configured timeout
+    '''
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        self.warm()
+
+        while True:
+            with self.condition:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.metrics["timeouts"] += 1
+                        raise PoolError("Timed out waiting for a database connection after " +
+                                        str(self.timeout) + " seconds")
+                    self.condition.wait(remaining)
+
+                if self.idle:
+                    conn, idle_since = self.idle.pop()
+                else:
+                    # Reserving the slot before connecting ensures the pool never exceeds its maximum size
+                    conn, idle_since = None, None
+                    self.size += 1
+
+            if conn is None:
+                try:
+                    conn = self.create()
+                except PoolError:
+                    self.release_slot()
+                    raise
+            elif not self.is_healthy(conn, idle_since):
+                self.discard(conn)
+                continue
+
+            with self.condition:
+                return self.checkout(conn, started)
+
+    '''
+    Function Description: A helper function utilized to open connections until the pool holds at least min_size connections. This is
+                          performed once on first use as the database may not yet be reachable when the pool is created.
+    '''
+
+    def warm(self):
+        with self.condition:
+            if self.warmed:
+                return
+            self.warmed = True
+            missing = max(self.min_size - self.size, 0)
+            self.size += missing
+
+        for _ in range(missing):
+            try:
+                conn = self.create()
+            except PoolError as error:
+                print(error)
+                self.release_slot()
+                continue
+            with self.condition:
+                self.idle.append((conn, time.monotonic()))
+                self.condition.notify()
+
+    '''
+    Function Description: A helper function utilized to free the slot of a connection which was closed or could not be opened.
+    '''
+
+    def release_slot(self):
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    '''
+    Function Description: A helper function utilized to record a checkout in the pool metrics.
+    @param conn => Connection object being checked out
+    @param started => Time the caller started waiting for the connection
+    @return Connection => The connection object being checked out
+    '''
+
+    def checkout(self, conn, started):
+        waited = time.monotonic() - started
+        self.in_use.add(conn)
+        self.metrics["checkouts"] += 1
+        self.metrics["wait_time_total"] += waited
+        self.metrics["wait_time_max"] = max(self.metrics["wait_time_max"], waited)
+        return conn
+
+    '''
+    Function Description: Main function utilized to return a connection to the pool. Any open transaction is rolled back so the
+                          next caller always receives a connection in a clean state.
+    @param conn => Connection object previously checked out with getconn
+    '''
+
+    def putconn(self, conn):
+        reusable = not conn.closed
+        if reusable:
+            try:
+                conn.rollback()
+            except (Exception, psycopg2.DatabaseError):
+                reusable = False
+
+        with self.condition:
+            self.in_use.discard(conn)
+            if reusable:
+                self.idle.append((conn, time.monotonic()))
+                self.condition.notify()
+            else:
+                self.discard(conn)
+
+    '''
+    Function Description: A helper function utilized to close every idle connection held by the pool.
+    '''
+
+    def closeall(self):
+        with self.condition:
+            while self.idle:
+                conn, _ = self.idle.pop()
+                self.discard(conn)
+
+    '''
+    Function Description: A helper function utilized to obtain a snapshot of the pool metrics.
+    @return dictionary => Dictionary containing the pool configuration, current usage and cumulative checkout metrics
+    '''
+
+    def stats(self):
+        with self.condition:
+            res = dict(self.metrics)
+            res["in_use"] = len(self.in_use)
+            res["idle"] = len(self.idle)
+            res["size"] = self.size
+            res["min_size"] = self.min_size
+            res["max_size"] = self.max_size
+            res["wait_time_avg"] = res["wait_time_total"] / res["checkouts"] if res["checkouts"] else 0.0
+            return res
+
+
+pool = None
+pool_lock = threading.Lock()
+
+'''
+Function Description: Function utilized to obtain the connection pool shared by every class accessing the database. The pool is created
+                      on first use utilizing the environment variables set in ./env/db.env, where the optional POOL_MIN_SIZE, POOL_MAX_SIZE,
+                      POOL_TIMEOUT and POOL_HEALTH_CHECK_INTERVAL variables configure the pool.
+@return ConnectionPool => The shared connection pool
+'''
+
+
+def get_pool():
+    global pool
+    with pool_lock:
+        if pool is None:
+            db = dotenv_values("./env/db.env")
+            db_env = {
+                "host": db["POSTGRES_HOST"],
+                "database": db["POSTGRES_DB"],
+                "user": db["POSTGRES_USER"],
+                "password": db["POSTGRES_PASSWORD"]
+            }
+            pool = ConnectionPool(
+                db_env,
+                min_size=int(db.get("POOL_MIN_SIZE") or 1),
+                max_size=int(db.get("POOL_MAX_SIZE") or 10),
+                timeout=float(db.get("POOL_TIMEOUT") or 10),
+                health_check_interval=float(db.get("POOL_HEALTH_CHECK_INTERVAL") or 30))
+        return pool
@@ -1,12 +1,25 @@
 from binance.client import Client
 from datetime import datetime, timedelta
-from dotenv import dotenv_values
 from env.units import SCRAP_UNITS, DEFAULT_START_DATE
+from db_pool import get_pool, PoolError
+from rollups import RESOLUTION_TABLES
+from metrics import Counter, Histogram
 
+import base64
+import json
 import psycopg2
-import sys
 import time
 
+# Read path metrics exposed by the /metrics endpoint, labelled by the GetData function issuing the query
+QUERY_SECONDS = Histogram(
+    "byenance_db_query_seconds", "Duration of read queries including retries", labels=("query",))
+QUERY_RETRIES = Counter(
+    "byenance_db_query_retries_total", "Read query attempts which failed and were retried", labels=("query",))
+QUERY_FAILURES = Counter(
+    "byenance_db_query_failures_total", "Read queries which failed after every retry attempt", labels=("query",))
+STREAM_ROWS = Counter(
+    "byenance_db_stream_rows_total", "Rows sent by streamed table exports", labels=("table",))
+
 '''
 Class Description: The class is responsible for fetching previously stored data entries from the database to be returned to the client 
 '''
@@ -16,62 +29,308 @@ class GetData():
 
     def __init__(self):
         super().__init__()
-        db = dotenv_values("./env/db.env")
-        self.db_env = {
-            "host": db["POSTGRES_HOST"],
-            "database": db["POSTGRES_DB"],
-            "user": db["POSTGRES_USER"],
-            "password": db["POSTGRES_PASSWORD"]
-        }
+        # Connections are checked out of the pool shared by every class accessing the database
+        self.pool = get_pool()
         self.max_retry = 5
         self.retry_interval = 5
+        # Number of rows transferred from the server side cursor per round trip during streamed exports
+        self.stream_batch_size = 2000
 
     '''
-    Function Description: A helper function utilize to connect to the PostgreSQL instance 
-    @return Connection => A connection object to PostgreSQL instance is returned 
-                          utilizing the environment variables set in ./env/database.env
+    Function Description: A helper function utilize to check a connection to the PostgreSQL instance out of the shared connection pool
+    @return Connection => A connection object to PostgreSQL instance is returned, None is returned if no connection could be obtained 
+                          as failures are reported to the caller rather than terminating the worker
     '''
 
     def connect(self):
         conn = None
         try:
-            conn = psycopg2.connect(**self.db_env)
-        except (Exception, psycopg2.DatabaseError) as error:
+            conn = self.pool.getconn()
+        except PoolError as error:
             print(error)
-            sys.exit(1)
         return conn
 
     '''
-    Function Description: Main function utilized to fetch data stored on database
-    @return table => Table name to be queried on the database
+    Function Description: A helper function utilize to return a connection to the shared connection pool
+    @param conn => Connection object obtained from connect
     '''
 
-    def run(self, table):
+    def release(self, conn):
+        self.pool.putconn(conn)
+
+    '''
+    Function Description: A helper function utilized to execute a read statement with the retry functionality shared by all queries.
+    @param statement => Parameterised SQL statement to be executed
+    @param params => Tuple of parameters bound to the statement
+    @param name => Name the query is recorded under in the query metrics
+    @return list => Rows returned by the statement, None is returned if every retry attempt failed
+    '''
+
+    def execute(self, statement, params=None, name="query"):
+        with QUERY_SECONDS.time(query=name):
+            data = self.execute_with_retry(statement, params, name)
+        if data is None:
+            QUERY_FAILURES.inc(query=name)
+        return data
+
+    '''
+    Function Description: A helper function utilized to execute a read statement, retrying failed attempts on a working connection.
+    @param statement => Parameterised SQL statement to be executed
+    @param params => Tuple of parameters bound to the statement
+    @param name => Name the query is recorded under in the query metrics
+    @return list => Rows returned by the statement, None is returned if every retry attempt failed
+    '''
+
+    def execute_with_retry(self, statement, params, name):
         conn = self.connect()
-        cursor = conn.cursor()
-        # This is acceptable only in this scenario as the table names are not user specifiable from the endpoints 
-        # Hence, there would be little to no threat of SQL injections. 
-        statement = "SELECT * FROM " + table
         data = None
         retry = 0
 
         # Retry funtionality when fetching data from the database 
         # The fetch will retry for a maximum of 5 times before closing the connection regardless 
-        while retry != self.max_retry:
+        while conn and retry != self.max_retry:
             try:
-                cursor.execute(statement)
+                cursor = conn.cursor()
+                cursor.execute(statement, params)
                 data = cursor.fetchall()
                 break
             except (Exception, psycopg2.DatabaseError) as error:
                 print(error)
                 # Rollback SQL transactions 
-                if conn:
+                if not conn.closed:
                     conn.rollback()
                 retry += 1
+                QUERY_RETRIES.inc(query=name)
                 print("Retry Attempt: " + str(retry) +
                       " / " + str(self.max_retry))
                 # Sleep in between retries 
                 time.sleep(self.retry_interval)
+                # Broken connections are returned to the pool to be discarded and replaced by a new connection
+                if conn.closed:
+                    self.release(conn)
+                    conn = self.connect()
         if conn:
-            conn.close()
+            self.release(conn)
         return data
+
+    '''
+    Function Description: Main function utilized to fetch data stored on database
+    @return table => Table name to be queried on the database
+    @param columns => Optional select list, defaults to every column of the table
+    '''
+
+    def run(self, table, columns="*"):
+        # This is acceptable only in this scenario as the table names are not user specifiable from the endpoints 
+        # Hence, there would be little to no threat of SQL injections. 
+        statement = "SELECT " + columns + " FROM " + table
+        return self.execute(statement, name="run_" + table)
+
+    '''
+    Function Description: Generator utilized to stream every row of a table for full table exports. A named (server side) cursor is 
+                          utilized so rows are transferred from the database in batches of stream_batch_size, keeping memory usage 
+                          bounded by the batch size rather than the size of the table.
+    @param table => Table name to be queried on the database
+    @param columns => Select list of the query, defaults to every column of the table
+    @return generator => Yields lists of at most stream_batch_size rows until the table is exhausted. A PoolError or database error is 
+                         raised rather than ending the stream early, so an incomplete export is never mistaken for a complete one
+    '''
+
+    def stream(self, table, columns="*"):
+        conn = self.pool.getconn()
+        try:
+            # Named cursors are declared on the server, rows are only sent to the client on each fetchmany call
+            cursor = conn.cursor(name="stream_" + table)
+            cursor.itersize = self.stream_batch_size
+            # This is acceptable only in this scenario as the table names are not user specifiable from the endpoints 
+            cursor.execute("SELECT " + columns + " FROM " + table)
+
+            while True:
+                rows = cursor.fetchmany(self.stream_batch_size)
+                if not rows:
+                    break
+                STREAM_ROWS.inc(len(rows), table=table)
+                yield rows
+            cursor.close()
+        finally:
+            self.release(conn)
+
+    '''
+    Function Description: Function utilized to fetch a single page of entries ordered by (unit, datetime).
+                          Pages are located with a keyset cursor rather than an OFFSET, hence the database only ever
+                          reads the rows of the requested page through the (unit, datetime) index regardless of how deep the page is.
+    @param limit => Maximum number of entries returned in the page
+    @param unit => Optional unit the entries are filtered by
+    @param start => Optional datetime object, only entries at or after this datetime are returned
+    @param end => Optional datetime object, only entries before this datetime are returned
+    @param after => Optional (unit, datetime) tuple of the last entry of the previous page
+    @return list => Rows of the page, None is returned if the query failed
+    @return tuple => (unit, datetime) of the last entry in the page if more entries are available, otherwise None
+    '''
+
+    def run_page(self, limit, unit=None, start=None, end=None, after=None):
+        conditions = []
+        params = []
+
+        if unit is not None:
+            conditions.append("unit = %s")
+            params.append(unit)
+        if start is not None:
+            conditions.append("datetime >= %s")
+            params.append(start)
+        if end is not None:
+            conditions.append("datetime < %s")
+            params.append(end)
+        if after is not None:
+            # Row value comparison allows the (unit, datetime) index to be used to seek directly to the next page
+            conditions.append("(unit, datetime) > (%s, %s)")
+            params.extend(after)
+
+        statement = "SELECT * FROM entries"
+        if conditions:
+            statement += " WHERE " + " AND ".join(conditions)
+        # An additional row is fetched to identify whether a following page exists without a separate COUNT query
+        statement += " ORDER BY unit, datetime LIMIT %s"
+        params.append(limit + 1)
+
+        data = self.execute(statement, tuple(params), name="run_page")
+        if data is None:
+            return (None, None)
+
+        next_key = None
+        if len(data) > limit:
+            data = data[:limit]
+            next_key = (data[-1][1], data[-1][2])
+        return (data, next_key)
+
+    '''
+    Function Description: A helper function utilized to convert the (unit, datetime) key of an entry into an opaque cursor string 
+                          which can be passed back by the client to fetch the following page.
+    @param key => (unit, datetime) tuple of the last entry of a page
+    @return String => URL safe cursor string
+    '''
+
+    def encode_cursor(self, key):
+        unit, key_datetime = key
+        raw = json.dumps([unit, key_datetime.isoformat()])
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    '''
+    Function Description: A helper function utilized to convert a cursor string created by encode_cursor back into its (unit, datetime) key.
+    @param cursor => URL safe cursor string
+    @return tuple => (unit, datetime) tuple, a ValueError is raised for malformed cursors
+    '''
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode("ascii"))
+            unit, key_datetime = json.loads(raw.decode("utf-8"))
+            return (unit, datetime.fromisoformat(key_datetime))
+        except (TypeError, ValueError, UnicodeError) as error:
+            raise ValueError("Invalid cursor: " + str(error))
+
+    '''
+    Function Description: A helper function utilized to obtain the datetime range of the entries of a unit, utilized to pick the resolution 
+                          of a series before any of its rows are fetched.
+    @param unit => crypto unit the entries are filtered by
+    @param start => Optional datetime object, only entries at or after this datetime are considered
+    @param end => Optional datetime object, only entries before this datetime are considered
+    @return tuple => Datetime objects of the first and last entry in the range, (None, None) if the range holds no entries or the query failed
+    '''
+
+    def get_span(self, unit, start=None, end=None):
+        statement = "SELECT min(datetime), max(datetime) FROM entries WHERE unit = %s"
+        params = [unit]
+        if start is not None:
+            statement += " AND datetime >= %s"
+            params.append(start)
+        if end is not None:
+            statement += " AND datetime < %s"
+            params.append(end)
+
+        data = self.execute(statement, tuple(params), name="get_span")
+        if not data:
+            return (None, None)
+        return data[0]
+
+    '''
+    Function Description: Function utilized to fetch the price series of a unit at a given resolution. Hourly series are read from the 
+                          entries table whereas daily and weekly series are read from their rollup tables, hence the number of rows read 
+                          is proportional to the length of the series rather than the number of entries it covers.
+    @param unit => crypto unit the series is fetched for
+    @param resolution => Resolution of the series, one of rollups.RESOLUTIONS
+    @param start => Optional datetime object, only data points at or after this datetime are returned
+    @param end => Optional datetime object, only data points before this datetime are returned
+    @return list => Rows of (datetime, opening, closing, high, low) ordered by datetime, None is returned if the query failed
+    '''
+
+    def run_series(self, unit, resolution, start=None, end=None):
+        if resolution == "hour":
+            point = "datetime"
+            statement = "SELECT datetime, opening, closing, GREATEST(opening, closing), LEAST(opening, closing) FROM entries"
+        else:
+            # Rollup buckets are UTC dates which are returned as the datetime the bucket starts at
+            point = "(bucket::timestamp AT TIME ZONE 'UTC')"
+            statement = "SELECT " + point + ", opening, closing, high, low FROM " + RESOLUTION_TABLES[resolution]
+
+        statement += " WHERE unit = %s"
+        params = [unit]
+        if start is not None:
+            statement += " AND " + point + " >= %s"
+            params.append(start)
+        if end is not None:
+            statement += " AND " + point + " < %s"
+            params.append(end)
+        statement += " ORDER BY 1"
+
+        return self.execute(statement, tuple(params), name="run_series")
+
+    '''
+    Function Description: Function utilized to fetch the most recent entries of every unit, utilized to warm the in-memory buffer of recent
+                          entries. The distinct units are found by seeking the next unit on the (unit, datetime) key and the latest entries
+                          of each unit are read backwards from the end of its range of the key, so only the rows returned are read.
+    @param limit => Maximum number of entries returned per unit
+    @return list => Rows of (unit, milliseconds since epoch, opening, closing, interpolated) ordered by unit and datetime, 
+                    None is returned if the query failed
+    '''
+
+    def run_recent(self, limit):
+        statement = (
+            "WITH RECURSIVE units AS ("
+            "SELECT min(unit) AS unit FROM entries "
+            "UNION ALL "
+            "SELECT (SELECT min(unit) FROM entries WHERE unit > units.unit) FROM units WHERE units.unit IS NOT NULL) "
+            "SELECT units.unit, recent.* FROM units CROSS JOIN LATERAL ("
+            "SELECT (extract(epoch FROM datetime) * 1000)::bigint, opening::float8, closing::float8, interpolated "
+            "FROM entries WHERE entries.unit = units.unit ORDER BY datetime DESC LIMIT %s) AS recent "
+            "WHERE units.unit IS NOT NULL "
+            "ORDER BY 1, 2")
+        return self.execute(statement, (limit,), name="run_recent")
+
+    '''
+    Function Description: Function utilized to fetch the closing prices of several units at a given resolution in a single query, utilized 
+                          to compute analytics. Hourly prices are read from the entries table whereas daily and weekly prices are read 
+                          from their rollup tables.
+    @param units => List of crypto units the closing prices are fetched for
+    @param resolution => Resolution of the prices, one of rollups.RESOLUTIONS
+    @param start => Optional datetime object, only data points at or after this datetime are returned
+    @param end => Optional datetime object, only data points before this datetime are returned
+    @return list => Rows of (unit, datetime, closing) ordered by datetime, None is returned if the query failed
+    '''
+
+    def run_closing(self, units, resolution, start=None, end=None):
+        if resolution == "hour":
+            point = "datetime"
+        else:
+            # Rollup buckets are UTC dates which are returned as the datetime the bucket starts at
+            point = "(bucket::timestamp AT TIME ZONE 'UTC')"
+        statement = "SELECT unit, " + point + ", closing::float8 FROM " + RESOLUTION_TABLES[resolution] + " WHERE unit = ANY(%s)"
+        params = [list(units)]
+        if start is not None:
+            statement += " AND " + point + " >= %s"
+            params.append(start)
+        if end is not None:
+            statement += " AND " + point + " < %s"
+            params.append(end)
+        statement += " ORDER BY 2, 1"
+
+        return self.execute(statement, tuple(params), name="run_closing")
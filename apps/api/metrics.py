@@ -0,0 +1,245 @@
+from contextlib import contextmanager
+
+import threading
+import time
+
+# Default histogram buckets in seconds, spanning a cached read up to a full history backfill
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+# Histogram buckets in bytes utilized for response payload sizes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+'''
+Function Description: A helper function utilized to format a label set in the Prometheus text exposition format.
+@param names => Tuple of label names
+@param values => Tuple of label values
+@return String => Formatted label set including the braces, an empty string if there are no labels
+'''
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(name + "=\"" + value + "\"")
+    return "{" + ",".join(pairs) + "}"
+
+
+'''
+Function Description: A helper function utilized to format a sample value in the Prometheus text exposition format.
+@param value => Numeric sample value
+@return String => Formatted sample value
+'''
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+'''
+Class Description: The class is responsible for holding every metric and rendering them in the Prometheus text exposition format.
+'''
+
+
+class Registry():
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.metrics = []
+
+    '''
+    Function Description: A helper function utilized to register a metric, called by the constructor of every metric.
+    @param metric => Metric to be registered
+    '''
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+
+    '''
+    Function Description: Main function utilized to render every registered metric for the /metrics endpoint.
+    @return String => Metrics in the Prometheus text exposition format
+    '''
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.append("# HELP " + metric.name + " " + metric.description)
+            lines.append("# TYPE " + metric.name + " " + metric.kind)
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Registry shared by every module, rendered by the /metrics endpoint
+REGISTRY = Registry()
+
+'''
+Class Description: The class is responsible for the state shared by every metric type, the label names of the metric and the values
+                   recorded for each label set. Values are either recorded directly or obtained from a function called whenever the
+                   metrics are rendered, e.g. to report statistics already kept by the connection pool.
+'''
+
+
+class Metric():
+    kind = "untyped"
+
+    def __init__(self, name, description, labels=(), registry=REGISTRY, function=None):
+        super().__init__()
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+        # Function returning a dictionary mapping each tuple of label values to its current value
+        self.function = function
+        registry.register(self)
+
+    '''
+    Function Description: A helper function utilized to obtain the label values of a sample in the order of the label names.
+    @param labels => Dictionary containing the value of every label of the metric
+    @return tuple => Tuple of label values, a ValueError is raised if a label is missing or unknown
+    '''
+
+    def key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(self.name + " expects the labels " + ", ".join(self.labels))
+        return tuple(str(labels[name]) for name in self.labels)
+
+    '''
+    Function Description: Function utilized to render the samples of the metric, implemented by every metric type.
+    @return list => List of sample lines in the Prometheus text exposition format
+    '''
+
+    def samples(self):
+        raise NotImplementedError
+
+    '''
+    Function Description: A helper function utilized to obtain the current value of every label set, ordered by label values.
+    @return list => List of (label values, value) tuples
+    '''
+
+    def current_values(self):
+        if self.function is None:
+            with self.lock:
+                return sorted(self.values.items())
+        try:
+            return sorted(self.function().items())
+        except Exception as error:
+            print(self.name + ": " + str(error))
+            return []
+
+
+'''
+Class Description: The class is responsible for a monotonically increasing count, e.g. the number of rows inserted.
+'''
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    '''
+    Function Description: Function utilized to increment the counter of a label set.
+    @param amount => Non negative amount the counter is incremented by
+    @param labels => Value of every label of the metric
+    '''
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        return [self.name + format_labels(self.labels, key) + " " + format_value(value) for key, value in self.current_values()]
+
+
+'''
+Class Description: The class is responsible for a value which can go up and down, e.g. the number of connections in use.
+'''
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    '''
+    Function Description: Function utilized to set the value of a label set.
+    @param value => Current value
+    @param labels => Value of every label of the metric
+    '''
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def samples(self):
+        return [self.name + format_labels(self.labels, key) + " " + format_value(value) for key, value in self.current_values()]
+
+
+'''
+Class Description: The class is responsible for the distribution of observed values, e.g. latencies, counted in cumulative buckets
+                   together with their sum and count so averages and quantiles can be derived by Prometheus.
+'''
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), registry=REGISTRY, buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels=labels, registry=registry)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    '''
+    Function Description: Function utilized to record an observed value for a label set.
+    @param value => Observed value
+    @param labels => Value of every label of the metric
+    '''
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][index] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    '''
+    Function Description: Context manager utilized to observe the duration of a block of code in seconds. The duration is observed
+                          even if the block raises an exception.
+    @param labels => Value of every label of the metric
+    '''
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self.lock:
+            values = sorted((key, {"buckets": list(state["buckets"]), "sum": state["sum"], "count": state["count"]})
+                            for key, state in self.values.items())
+        lines = []
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["buckets"]):
+                cumulative += count
+                lines.append(self.name + "_bucket" + format_labels(self.labels + ("le",), key + (format_value(bound),)) +
+                             " " + format_value(cumulative))
+            lines.append(self.name + "_sum" + format_labels(self.labels, key) + " " + format_value(state["sum"]))
+            lines.append(self.name + "_count" + format_labels(self.labels, key) + " " + format_value(state["count"]))
+        return lines
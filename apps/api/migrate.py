@@ -0,0 +1,101 @@
+from db_pool import get_pool, PoolError
+
+import os
+import psycopg2
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# Migration files are named <version>_<description>.sql and applied in ascending version order
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+# Key of the advisory lock held while migrating, so concurrent API processes never apply the same migration twice
+MIGRATION_LOCK_ID = 7321584001
+
+'''
+Function Description: A helper function utilized to list the migration files found in the migrations directory.
+@param directory => Directory containing the migration files
+@return list => List of (version, name, path) tuples ordered by version
+'''
+
+
+def list_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+    return migrations
+
+
+'''
+Function Description: Main function utilized to bring the database schema up to date. Every migration file which has not yet been
+                      recorded in the schema_migrations table is applied in its own transaction together with its record, hence a
+                      failing migration is rolled back entirely and retried on the next start up. A session level advisory lock
+                      serializes concurrent callers, which find the migrations already applied once they obtain the lock.
+@param conn => Connection object to the PostgreSQL instance
+@param directory => Directory containing the migration files
+@return list => List containing the versions of the migrations applied
+'''
+
+
+def migrate(conn, directory=MIGRATIONS_DIR):
+    applied = []
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+    try:
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS public.schema_migrations ("
+            "version integer PRIMARY KEY, "
+            "name text NOT NULL, "
+            "applied_at timestamp with time zone DEFAULT now() NOT NULL)")
+        cursor.execute("SELECT version FROM public.schema_migrations")
+        versions = set(row[0] for row in cursor.fetchall())
+        conn.commit()
+
+        for version, name, path in list_migrations(directory):
+            if version in versions:
+                continue
+            with open(path) as migration:
+                statements = migration.read()
+            cursor.execute(statements)
+            cursor.execute("INSERT INTO public.schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+            print("Applied migration " + str(version) + " " + name)
+            applied.append(version)
+    finally:
+        if not conn.closed:
+            # Any failed migration is rolled back before the lock is released
+            conn.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.commit()
+    return applied
+
+
+'''
+Function Description: Function utilized to apply pending migrations with a connection of the shared connection pool. Failures are
+                      reported rather than raised, as the database may not yet be reachable when the API starts.
+@param pool => Optional connection pool, defaults to the pool shared by every class accessing the database
+@return boolean => True if the database schema is up to date
+'''
+
+
+def run_migrations(pool=None):
+    pool = pool if pool is not None else get_pool()
+    try:
+        conn = pool.getconn()
+    except PoolError as error:
+        print(error)
+        return False
+
+    try:
+        migrate(conn)
+        return True
+    except (Exception, psycopg2.DatabaseError) as error:
+        print("Migration failed: " + str(error))
+        return False
+    finally:
+        pool.putconn(conn)
+
+
+if __name__ == "__main__":
+    run_migrations()
@@ -0,0 +1,83 @@
+--
+-- Moves entries into a table partitioned by year on datetime, keyed by (unit, datetime).
+-- Every query of the ingest and the API filters on a unit and a datetime range, hence lookups only visit the index of the
+-- partitions overlapping the range and the latency of the hot queries stays flat as the history grows.
+--
+
+ALTER TABLE public.entries RENAME TO entries_heap;
+ALTER TABLE public.entries_heap RENAME CONSTRAINT entries_pkey TO entries_heap_pkey;
+DROP INDEX IF EXISTS public.entries_unit_datetime_idx;
+
+-- The integer identity column is replaced by a bigint column with a sequence default, so the existing ids are copied over as is
+-- and ids do not run out as the history grows. Dropping the identity drops its sequence.
+ALTER TABLE public.entries_heap ALTER COLUMN id DROP IDENTITY;
+
+CREATE SEQUENCE public.entries_id_seq AS bigint;
+
+CREATE TABLE public.entries (
+    id bigint DEFAULT nextval('public.entries_id_seq') NOT NULL,
+    unit character varying(25) NOT NULL,
+    datetime timestamp with time zone NOT NULL,
+    opening numeric NOT NULL,
+    closing numeric NOT NULL,
+    interpolated boolean NOT NULL
+) PARTITION BY RANGE (datetime);
+
+ALTER SEQUENCE public.entries_id_seq OWNED BY public.entries.id;
+
+-- Entries outside of every yearly partition are kept in the default partition until their year is created
+CREATE TABLE public.entries_default PARTITION OF public.entries DEFAULT;
+
+--
+-- Creates the partition holding the entries of a UTC year unless it already exists. Entries of the year which were written to the
+-- default partition beforehand are moved into the new partition. Called by the ingest before entries are written, in its own
+-- transaction, as creating a partition locks the entries table.
+--
+
+CREATE FUNCTION public.ensure_entries_partition(year integer) RETURNS void
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    partition_name text := 'entries_y' || year;
+    lower_bound timestamp with time zone := make_timestamptz(year, 1, 1, 0, 0, 0, 'UTC');
+    upper_bound timestamp with time zone := make_timestamptz(year + 1, 1, 1, 0, 0, 0, 'UTC');
+BEGIN
+    -- Concurrent callers creating the same partition are serialized
+    PERFORM pg_advisory_xact_lock(hashtext('public.ensure_entries_partition'));
+    IF to_regclass('public.' || partition_name) IS NOT NULL THEN
+        RETURN;
+    END IF;
+
+    CREATE TEMPORARY TABLE entries_moved (LIKE public.entries) ON COMMIT DROP;
+    WITH moved AS (
+        DELETE FROM public.entries_default WHERE datetime >= lower_bound AND datetime < upper_bound RETURNING *
+    )
+    INSERT INTO entries_moved SELECT * FROM moved;
+
+    EXECUTE format('CREATE TABLE public.%I PARTITION OF public.entries FOR VALUES FROM (%L) TO (%L)',
+                   partition_name, lower_bound, upper_bound);
+
+    INSERT INTO public.entries SELECT * FROM entries_moved;
+    DROP TABLE entries_moved;
+END
+$$;
+
+SELECT public.ensure_entries_partition(year)
+FROM generate_series(
+    COALESCE((SELECT extract(year FROM min(datetime) AT TIME ZONE 'UTC') FROM public.entries_heap),
+             extract(year FROM now() AT TIME ZONE 'UTC'))::integer,
+    extract(year FROM now() AT TIME ZONE 'UTC')::integer + 1) AS year;
+
+-- Duplicate hourly entries are dropped, keeping the entry which was written first
+INSERT INTO public.entries (id, unit, datetime, opening, closing, interpolated)
+SELECT DISTINCT ON (unit, datetime) id, unit, datetime, opening, closing, interpolated
+FROM public.entries_heap
+ORDER BY unit, datetime, id;
+
+SELECT setval('public.entries_id_seq', COALESCE((SELECT max(id) FROM public.entries), 0) + 1, false);
+
+DROP TABLE public.entries_heap;
+
+-- Indexes are built once the entries are loaded, both are created on every partition
+ALTER TABLE public.entries ADD CONSTRAINT entries_pkey PRIMARY KEY (unit, datetime);
+CREATE INDEX entries_datetime_brin_idx ON public.entries USING brin (datetime);
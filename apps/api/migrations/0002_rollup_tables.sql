@@ -0,0 +1,41 @@
+--
+-- Daily and weekly rollups of the entries served by /getSeries, refreshed by the ingest together with the entries.
+-- The tables may already exist on databases initialized with an earlier schema_init.sql.
+--
+
+CREATE TABLE IF NOT EXISTS public.entries_daily (
+    unit character varying(25) NOT NULL,
+    bucket date NOT NULL,
+    opening numeric NOT NULL,
+    closing numeric NOT NULL,
+    high numeric NOT NULL,
+    low numeric NOT NULL,
+    entries integer NOT NULL,
+    CONSTRAINT entries_daily_pkey PRIMARY KEY (unit, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS public.entries_weekly (
+    unit character varying(25) NOT NULL,
+    bucket date NOT NULL,
+    opening numeric NOT NULL,
+    closing numeric NOT NULL,
+    high numeric NOT NULL,
+    low numeric NOT NULL,
+    entries integer NOT NULL,
+    CONSTRAINT entries_weekly_pkey PRIMARY KEY (unit, bucket)
+);
+
+-- Backfill of the rollups of the entries already stored
+INSERT INTO public.entries_daily (unit, bucket, opening, closing, high, low, entries)
+SELECT unit, date_trunc('day', datetime AT TIME ZONE 'UTC')::date, (array_agg(opening ORDER BY datetime))[1],
+       (array_agg(closing ORDER BY datetime DESC))[1], max(GREATEST(opening, closing)), min(LEAST(opening, closing)), count(*)
+FROM public.entries
+GROUP BY unit, 2
+ON CONFLICT (unit, bucket) DO NOTHING;
+
+INSERT INTO public.entries_weekly (unit, bucket, opening, closing, high, low, entries)
+SELECT unit, date_trunc('week', datetime AT TIME ZONE 'UTC')::date, (array_agg(opening ORDER BY datetime))[1],
+       (array_agg(closing ORDER BY datetime DESC))[1], max(GREATEST(opening, closing)), min(LEAST(opening, closing)), count(*)
+FROM public.entries
+GROUP BY unit, 2
+ON CONFLICT (unit, bucket) DO NOTHING;
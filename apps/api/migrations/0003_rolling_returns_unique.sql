@@ -0,0 +1,11 @@
+--
+-- Adds a unique (unit, date) key to rolling_returns so rolling returns are written with idempotent upserts.
+-- Duplicate rolling returns are dropped, keeping the rolling return which was written first.
+--
+
+DELETE FROM public.rolling_returns duplicate
+USING public.rolling_returns original
+WHERE duplicate.unit = original.unit AND duplicate.date = original.date AND duplicate.rid > original.rid;
+
+ALTER TABLE ONLY public.rolling_returns
+    ADD CONSTRAINT rolling_returns_unit_date_key UNIQUE (unit, date);
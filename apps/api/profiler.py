@@ -0,0 +1,89 @@
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from datetime import datetime
+
+import os
+import sys
+import threading
+
+'''
+Class Description: The class is responsible for sampling the call stacks of every running thread at a fixed interval while a block of
+                   code is profiled, e.g. an ingest run. Samples are written in the collapsed stack format, one "frame;frame;frame count"
+                   line per distinct stack, which flamegraph.pl and speedscope render as a flame graph. Sampling from a separate thread
+                   keeps the overhead bounded by the interval rather than the number of function calls made by the profiled code.
+'''
+
+
+class SamplingProfiler():
+
+    def __init__(self, interval=0.01, output_dir="./profiles"):
+        super().__init__()
+        self.interval = interval
+        self.output_dir = output_dir
+
+    '''
+    Function Description: A helper function utilized to collapse the stack of a frame into a single line, outermost frame first.
+    @param frame => Innermost frame of a thread
+    @return String => Frames of the stack separated by semicolons
+    '''
+
+    def collapse(self, frame):
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(code.co_name + " (" + os.path.basename(code.co_filename) + ":" + str(frame.f_lineno) + ")")
+            frame = frame.f_back
+        frames.reverse()
+        return ";".join(frames)
+
+    '''
+    Function Description: A helper function utilized to sample the stack of every thread other than the sampling thread until stopped.
+    @param stacks => Counter the number of samples of each collapsed stack is added to
+    @param stopped => Event set once the profiled block completed
+    '''
+
+    def sample(self, stacks, stopped):
+        sampler = threading.get_ident()
+        while not stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != sampler:
+                    stacks[self.collapse(frame)] += 1
+
+    '''
+    Function Description: Context manager utilized to profile a block of code. The collapsed stacks are written to a file named after
+                          the profile name and the time the block started in output_dir.
+    @param name => Name of the profile, e.g. ingest
+    '''
+
+    @contextmanager
+    def profile(self, name):
+        stacks = StackCounter()
+        stopped = threading.Event()
+        sampler = threading.Thread(target=self.sample, args=(stacks, stopped), daemon=True)
+        started = datetime.now()
+        sampler.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            sampler.join()
+            self.write(name, started, stacks)
+
+    '''
+    Function Description: A helper function utilized to write the collapsed stacks of a profile. Failures are reported without affecting
+                          the profiled code.
+    @param name => Name of the profile
+    @param started => datetime object of the start of the profile
+    @param stacks => Counter containing the number of samples of each collapsed stack
+    '''
+
+    def write(self, name, started, stacks):
+        path = os.path.join(self.output_dir, name + "-" + started.strftime("%Y%m%dT%H%M%S") + ".folded")
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(path, "w") as output:
+                for stack, count in stacks.most_common():
+                    output.write(stack + " " + str(count) + "\n")
+            print("Profile written to " + path + " (" + str(sum(stacks.values())) + " samples)")
+        except OSError as error:
+            print(error)
@@ -0,0 +1,201 @@
+import numpy as np
+import threading
+
+# Fields held for every entry, in the order of the rows returned by GetData.run_recent after the unit
+RECENT_FIELDS = ("datetime", "opening", "closing", "interpolated")
+RECENT_DTYPES = {
+    "datetime": np.int64,
+    "opening": np.float64,
+    "closing": np.float64,
+    "interpolated": np.bool_
+}
+
+'''
+Class Description: The class is responsible for holding the latest entries of a single unit in fixed size NumPy arrays used as a ring
+                   buffer, one array per field with datetimes stored as milliseconds since epoch. Appending overwrites the oldest
+                   entries in place once the buffer is full, hence no memory is allocated after the buffer is created. The class is
+                   not thread safe, access is serialized by RecentEntries.
+'''
+
+
+class EntryRing():
+
+    def __init__(self, capacity):
+        super().__init__()
+        self.capacity = capacity
+        self.arrays = {field: np.zeros(capacity, dtype=RECENT_DTYPES[field]) for field in RECENT_FIELDS}
+        # Position the next entry is written to and number of entries held
+        self.end = 0
+        self.count = 0
+
+    '''
+    Function Description: A helper function utilized to obtain the positions of the latest entries in chronological order.
+    @param limit => Number of latest entries, at most count
+    @return ndarray => Array of positions in the field arrays
+    '''
+
+    def positions(self, limit):
+        return (self.end - limit + np.arange(limit)) % self.capacity
+
+    '''
+    Function Description: Function utilized to append entries following the latest entry held. Entries held at or after the first appended
+                          entry are dropped beforehand, so entries rewritten by the ingest replace their previous values.
+    @param columns => Dictionary mapping every field to an array of values ordered by datetime
+    '''
+
+    def append(self, columns):
+        datetimes = columns["datetime"]
+        if len(datetimes) == 0:
+            return
+
+        if self.count > 0:
+            held = self.arrays["datetime"][self.positions(self.count)]
+            dropped = self.count - int(np.searchsorted(held, datetimes[0], side="left"))
+            self.end = (self.end - dropped) % self.capacity
+            self.count -= dropped
+
+        # Only the latest capacity entries can be held, older entries would be overwritten by the same append
+        offset = max(len(datetimes) - self.capacity, 0)
+        size = len(datetimes) - offset
+        positions = (self.end + np.arange(size)) % self.capacity
+        for field in RECENT_FIELDS:
+            self.arrays[field][positions] = columns[field][offset:]
+        self.end = (self.end + size) % self.capacity
+        self.count = min(self.count + size, self.capacity)
+
+    '''
+    Function Description: Function utilized to read the latest entries in chronological order.
+    @param limit => Maximum number of entries returned
+    @param start => Optional milliseconds since epoch, only entries at or after this time are returned
+    @return dictionary => Dictionary mapping every field to a copy of its values
+    '''
+
+    def read(self, limit, start=None):
+        positions = self.positions(min(limit, self.count))
+        datetimes = self.arrays["datetime"][positions]
+        if start is not None:
+            first = int(np.searchsorted(datetimes, start, side="left"))
+            positions = positions[first:]
+            datetimes = datetimes[first:]
+        res = {field: self.arrays[field][positions] for field in RECENT_FIELDS if field != "datetime"}
+        res["datetime"] = datetimes
+        return res
+
+
+'''
+Class Description: The class is responsible for serving the latest entries of every unit from memory, so requests for the last hours, day
+                   or week of prices do not query the database. The buffers are warmed from the database once at start up and kept
+                   current by appending the entries of every ingest commit, registered as an UploadData commit listener. Commits
+                   received while the buffers are warmed are recorded and appended once the entries read from the database are in
+                   place, as the warm up may have read the database before they committed.
+'''
+
+
+class RecentEntries():
+
+    def __init__(self, capacity=168):
+        super().__init__()
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.rings = {}
+        self.warmed = False
+        # Lists of the commits received by every warm up in progress
+        self.warming = []
+
+    '''
+    Function Description: Function utilized to load the latest capacity entries of every unit from the database, replacing the entries held.
+                          Commits received while the database is read are appended afterwards, so none of them is lost.
+    @param gd => GetData object utilized to read the entries
+    @return boolean => True if the buffers were warmed, False if the query failed
+    '''
+
+    def warm(self, gd):
+        received = []
+        with self.lock:
+            self.warming.append(received)
+        try:
+            data = gd.run_recent(self.capacity)
+            if data is None:
+                return False
+
+            rows = {}
+            for d in data:
+                rows.setdefault(d[0], []).append(d[1:])
+
+            rings = {}
+            for unit, unit_rows in rows.items():
+                values = list(zip(*unit_rows))
+                rings[unit] = EntryRing(self.capacity)
+                rings[unit].append({
+                    field: np.array(values[index], dtype=RECENT_DTYPES[field]) for index, field in enumerate(RECENT_FIELDS)
+                })
+
+            with self.lock:
+                self.rings = rings
+                # Commits are appended in the order they were received, so entries read from the database which a commit rewrote
+                # are replaced by the committed values
+                for prices in received:
+                    self.apply(prices)
+                self.warmed = True
+            return True
+        finally:
+            with self.lock:
+                self.warming = [commits for commits in self.warming if commits is not received]
+
+    '''
+    Function Description: Function utilized to append the entries of an ingest commit. Any arguments other than the committed entries are
+                          ignored, allowing the function to be registered directly as an UploadData commit listener.
+    @param prices => Dictionary mapping each updated unit to the dataframe of entries committed
+    '''
+
+    def append(self, prices, *args):
+        with self.lock:
+            for received in self.warming:
+                received.append(prices)
+            if self.warmed:
+                self.apply(prices)
+
+    '''
+    Function Description: A helper function utilized to append the entries of a commit to the buffers, called while holding the lock.
+    @param prices => Dictionary mapping each updated unit to the dataframe of entries committed
+    '''
+
+    def apply(self, prices):
+        for unit, frame in prices.items():
+            if len(frame) == 0:
+                continue
+            frame = frame.sort_values("datetime")
+            columns = {
+                "datetime": frame["datetime"].values.astype("datetime64[ms]").astype(np.int64),
+                "opening": frame["opening"].to_numpy(dtype=np.float64),
+                "closing": frame["closing"].to_numpy(dtype=np.float64),
+                "interpolated": frame["interpolated"].to_numpy().astype(np.bool_)
+            }
+            ring = self.rings.get(unit)
+            if ring is None:
+                ring = self.rings[unit] = EntryRing(self.capacity)
+            ring.append(columns)
+
+    '''
+    Function Description: Function utilized to read the latest entries of a unit.
+    @param unit => crypto unit the entries are read for
+    @param limit => Maximum number of entries returned
+    @param start => Optional milliseconds since epoch, only entries at or after this time are returned
+    @return dictionary => Dictionary mapping every field to an array of values in chronological order, None if the unit is not held
+    '''
+
+    def get(self, unit, limit, start=None):
+        with self.lock:
+            ring = self.rings.get(unit)
+            if ring is None:
+                return None
+            return ring.read(limit, start=start)
+
+    '''
+    Function Description: A helper function utilized to obtain the number of entries held for every unit.
+    @return dictionary => Dictionary mapping each unit to the number of entries held
+    '''
+
+    def stats(self):
+        with self.lock:
+            return {unit: ring.count for unit, ring in self.rings.items()}
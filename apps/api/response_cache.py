@@ -0,0 +1,112 @@
+from collections import OrderedDict
+
+import hashlib
+import threading
+
+'''
+Class Description: The class is responsible for caching serialized endpoint responses between ingests. Entries are evicted in least
+                   recently used order once either the entry or byte budget is exceeded. As the stored data only changes when an ingest
+                   commits, the cache is invalidated by bumping its data version whenever UploadData.run commits new rows.
+'''
+
+
+class ResponseCache():
+
+    def __init__(self, max_entries=128, max_bytes=128 * 1024 * 1024):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+        self.version = 0
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0
+        }
+
+    '''
+    Function Description: Function utilized to fetch a cached response.
+    @param key => Key identifying the endpoint and its query parameters
+    @return dictionary => Dictionary containing the body, mimetype and etag of the cached response, None if the key is not cached
+    '''
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.metrics["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.metrics["hits"] += 1
+            return entry
+
+    '''
+    Function Description: Function utilized to store a serialized response. Responses built from data read before the latest
+                          invalidation are discarded as they may no longer reflect the database.
+    @param key => Key identifying the endpoint and its query parameters
+    @param body => Serialized response body in bytes
+    @param mimetype => Mimetype of the response body
+    @param version => Data version returned by current_version before the response was built
+    @return dictionary => Dictionary containing the body, mimetype and etag of the response
+    '''
+
+    def set(self, key, body, mimetype, version):
+        entry = {
+            "body": body,
+            "mimetype": mimetype,
+            "etag": hashlib.sha1(body).hexdigest()
+        }
+
+        with self.lock:
+            if version != self.version or len(body) > self.max_bytes:
+                return entry
+
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key)["body"])
+            self.entries[key] = entry
+            self.size += len(body)
+
+            # Evicting the least recently used responses until the cache is within its budget
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted["body"])
+                self.metrics["evictions"] += 1
+        return entry
+
+    '''
+    Function Description: A helper function utilized to obtain the current data version, which must be captured before reading the
+                          database for a response that will be passed to set.
+    @return int => Current data version
+    '''
+
+    def current_version(self):
+        with self.lock:
+            return self.version
+
+    '''
+    Function Description: Function utilized to drop every cached response once new data is committed to the database.
+                          Any arguments are ignored, allowing the function to be registered directly as an UploadData commit listener.
+    '''
+
+    def invalidate(self, *args):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.version += 1
+            self.metrics["invalidations"] += 1
+
+    '''
+    Function Description: A helper function utilized to obtain a snapshot of the cache metrics.
+    @return dictionary => Dictionary containing the cache usage and cumulative hit, miss and eviction counts
+    '''
+
+    def stats(self):
+        with self.lock:
+            res = dict(self.metrics)
+            res["entries"] = len(self.entries)
+            res["bytes"] = self.size
+            res["version"] = self.version
+            return res
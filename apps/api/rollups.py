@@ -0,0 +1,93 @@
+import numpy as np
+
+# Resolutions a series can be requested at, ordered from the finest to the coarsest, with the table the series is served from
+# and the number of hours covered by each data point. Hourly series are served from the entries table itself.
+RESOLUTIONS = ["hour", "day", "week"]
+RESOLUTION_TABLES = {
+    "hour": "entries",
+    "day": "entries_daily",
+    "week": "entries_weekly"
+}
+RESOLUTION_HOURS = {
+    "hour": 1,
+    "day": 24,
+    "week": 24 * 7
+}
+
+'''
+Function Description: Function utilized to bring the daily and weekly rollups of a unit up to date with its entries. Every bucket from
+                      the one containing since onwards is recomputed from the entries table and upserted, hence only the buckets touched
+                      by an ingest are rewritten. Buckets from the latest rollup stored for the unit onwards are recomputed as well, so
+                      units whose entries were loaded before their rollups existed are backfilled on their next ingest.
+@param cursor => Cursor object utilized for SQL statement executions.
+@param unit => crypto unit the rollups are refreshed for
+@param since => datetime object of the earliest entry written since the rollups were last refreshed
+'''
+
+
+def refresh_rollups(cursor, unit, since):
+    for resolution in RESOLUTIONS[1:]:
+        table = RESOLUTION_TABLES[resolution]
+        # Buckets are aligned to UTC days and ISO weeks starting on Monday regardless of the session time zone
+        bucket = "date_trunc('" + resolution + "', datetime AT TIME ZONE 'UTC')::date"
+        # Table names and resolutions are never user specifiable, only the unit and datetime are bound as parameters
+        statement = (
+            "INSERT INTO " + table + " (unit, bucket, opening, closing, high, low, entries) "
+            "SELECT unit, " + bucket + ", (array_agg(opening ORDER BY datetime))[1], "
+            "(array_agg(closing ORDER BY datetime DESC))[1], max(GREATEST(opening, closing)), "
+            "min(LEAST(opening, closing)), count(*) "
+            "FROM entries WHERE unit = %s AND datetime >= LEAST("
+            "date_trunc('" + resolution + "', %s::timestamptz AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', "
+            "COALESCE((SELECT max(bucket)::timestamp AT TIME ZONE 'UTC' FROM " + table + " WHERE unit = %s), '-infinity')) "
+            "GROUP BY unit, 2 "
+            "ON CONFLICT (unit, bucket) DO UPDATE SET opening = EXCLUDED.opening, closing = EXCLUDED.closing, "
+            "high = EXCLUDED.high, low = EXCLUDED.low, entries = EXCLUDED.entries")
+        cursor.execute(statement, (unit, since, unit))
+
+
+'''
+Function Description: Function utilized to downsample a series with the Largest Triangle Three Buckets algorithm. The points between the
+                      first and last point are split into threshold - 2 buckets and the point of each bucket forming the largest triangle
+                      with the point selected in the previous bucket and the average of the next bucket is kept, preserving the peaks and
+                      troughs a chart needs. Bucket averages are computed vectorially from cumulative sums and each bucket is evaluated
+                      with a single numpy expression, leaving one iteration per output point as the selection of a bucket depends
+                      on the previous bucket.
+@param x => Numpy array of the x coordinates of the series in ascending order, e.g. epoch seconds
+@param y => Numpy array of the y coordinates of the series
+@param threshold => Maximum number of points returned
+@return array => Numpy array containing the ascending indices of the points kept
+'''
+
+
+def lttb(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Only differences between x coordinates matter, shifting them keeps the cumulative sums precise
+    x = np.asarray(x, dtype=np.float64) - x[0]
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket i spans the points edges[i] up to edges[i + 1], every bucket holds at least one point as threshold < n
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = edges[1:] - edges[:-1]
+    x_sums = np.concatenate(([0], np.cumsum(x)))
+    y_sums = np.concatenate(([0], np.cumsum(y)))
+    x_averages = (x_sums[edges[1:]] - x_sums[edges[:-1]]) / counts
+    y_averages = (y_sums[edges[1:]] - y_sums[edges[:-1]]) / counts
+    # The third point of the triangle is the average of the next bucket, or the last point for the final bucket
+    next_x = np.append(x_averages[1:], x[-1])
+    next_y = np.append(y_averages[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    anchor = 0
+    for i in range(threshold - 2):
+        lower, upper = edges[i], edges[i + 1]
+        # Twice the area of the triangle formed by the anchor, each candidate point and the next bucket average
+        areas = np.abs((x[anchor] - next_x[i]) * (y[lower:upper] - y[anchor]) -
+                       (x[anchor] - x[lower:upper]) * (next_y[i] - y[anchor]))
+        anchor = lower + int(np.argmax(areas))
+        selected[i + 1] = anchor
+    return selected
@@ -0,0 +1,246 @@
+from env.units import SCRAP_UNITS
+from metrics import Counter, Histogram
+from upload_data import to_milliseconds, HOUR_MS
+
+import asyncio
+import json
+import psycopg2
+import threading
+import time
+import websockets
+
+BINANCE_STREAM_URL = "wss://stream.binance.com:9443"
+
+# Kline stream metrics exposed by the /metrics endpoint
+STREAM_KLINES = Counter(
+    "byenance_stream_klines_total", "Closed klines received from the kline stream per unit", labels=("unit",))
+STREAM_RECONNECTS = Counter(
+    "byenance_stream_reconnects_total", "Kline stream connections which were lost and reopened")
+STREAM_CATCH_UPS = Counter(
+    "byenance_stream_catch_ups_total", "REST catch-up runs triggered by a new connection or a gap in the kline stream")
+STREAM_LAG_SECONDS = Histogram(
+    "byenance_stream_lag_seconds", "Time from the close of a kline to the commit of its entry")
+
+'''
+Class Description: The class is responsible for ingesting hourly klines as they close rather than polling the REST API every hour. A
+                   single connection to the Binance combined stream endpoint subscribes to the hourly kline stream of every unit and
+                   closed klines are buffered for flush_interval seconds, so the klines of every unit closing at the same hour are written
+                   together. Entries are written by UploadData.ingest_unit, hence they are interpolated, upserted and their rolling
+                   returns and rollups updated exactly like polled entries. Whenever the stream (re)connects or a kline does not directly
+                   follow the latest entry of its unit, the missing hours are caught up from the REST API with UploadData.run. The base
+                   URL is configurable so a local server can stand in for Binance.
+'''
+
+
+class StreamIngest():
+
+    def __init__(self, upload, base_url=BINANCE_STREAM_URL, units=None, flush_interval=2.0,
+                 reconnect_interval=1, max_reconnect_interval=60):
+        super().__init__()
+        self.upload = upload
+        self.base_url = base_url.rstrip("/")
+        self.units = sorted(units if units is not None else SCRAP_UNITS)
+        self.flush_interval = flush_interval
+        self.reconnect_interval = reconnect_interval
+        self.max_reconnect_interval = max_reconnect_interval
+        # Closed klines received since the last flush, keyed by unit and open time so repeated events are written once
+        self.pending = {}
+        self.pending_since = None
+        # datetime object of the latest entry of each unit, known after the first catch-up
+        self.latest = {}
+        # Units whose klines are fetched by a REST catch-up rather than written from the stream
+        self.needs_catch_up = set(self.units)
+        self.stopped = threading.Event()
+        self.thread = None
+
+    '''
+    Function Description: A helper function utilized to build the URL of the combined stream of the hourly klines of every unit.
+    @return String => URL of the combined stream
+    '''
+
+    def stream_url(self):
+        streams = "/".join(unit.lower() + "@kline_1h" for unit in self.units)
+        return self.base_url + "/stream?streams=" + streams
+
+    '''
+    Function Description: A helper function utilized to convert a message of the combined stream into a kline in the format returned by
+                          the REST API. Klines which have not yet closed are ignored as their prices are still changing.
+    @param message => Message received from the combined stream
+    @return tuple => Unit and kline list of a closed kline, None if the message does not hold a closed kline
+    '''
+
+    def parse(self, message):
+        try:
+            event = json.loads(message)
+            # Combined streams wrap each event together with the name of its stream
+            event = event.get("data", event)
+            if event.get("e") != "kline":
+                return None
+            kline = event["k"]
+            if not kline["x"]:
+                return None
+            return (kline["s"], [kline["t"], kline["o"], kline["h"], kline["l"], kline["c"], kline["v"], kline["T"]])
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            print("Invalid kline stream message: " + str(error))
+            return None
+
+    '''
+    Function Description: A helper function utilized to buffer a closed kline until the next flush.
+    @param unit => crypto unit of the kline
+    @param kline => Kline list in the format returned by the REST API
+    '''
+
+    def add(self, unit, kline):
+        if self.pending_since is None:
+            self.pending_since = time.monotonic()
+        self.pending.setdefault(unit, {})[int(kline[0])] = kline
+        STREAM_KLINES.inc(unit=unit)
+
+    '''
+    Function Description: A helper function utilized to buffer klines again once writing them was deferred, keeping klines received since.
+    @param pending => Dictionary mapping each unit to its buffered klines keyed by open time
+    '''
+
+    def defer(self, pending):
+        for unit, klines in pending.items():
+            buffered = self.pending.setdefault(unit, {})
+            for open_time, kline in klines.items():
+                buffered.setdefault(open_time, kline)
+        if self.pending and self.pending_since is None:
+            self.pending_since = time.monotonic()
+
+    '''
+    Function Description: Function utilized to fetch every missing hour from the REST API and reload the latest entry of every unit.
+                          Buffered klines of the units caught up are discarded as they closed before the catch-up started and were
+                          therefore fetched by it. Units which failed in the run are caught up again on the next flush, whereas a run
+                          skipped as another ingest was in progress leaves every unit to be caught up and keeps its klines buffered.
+    @param pending => Optional dictionary mapping units to their buffered klines keyed by open time
+    '''
+
+    def catch_up(self, pending=None):
+        STREAM_CATCH_UPS.inc()
+        caught_up = self.upload.run()
+
+        conn = self.upload.connect()
+        if conn is None:
+            self.defer(pending or {})
+            return
+        try:
+            self.latest = self.upload.get_latest_entry(conn.cursor())
+        except (Exception, psycopg2.DatabaseError) as error:
+            print(error)
+            self.defer(pending or {})
+            return
+        finally:
+            self.upload.release(conn)
+
+        if caught_up is None:
+            self.defer(pending or {})
+        else:
+            self.needs_catch_up = set(self.upload.failed_units) & set(self.units)
+
+    '''
+    Function Description: A helper function utilized to write buffered klines, each unit is ingested in its own transaction.
+    @param pending => Dictionary mapping each unit to its buffered klines keyed by open time
+    @return dictionary => Dictionary mapping each unit committed to the dataframe of entries committed
+    '''
+
+    def write(self, pending):
+        committed = {}
+        for unit, klines in pending.items():
+            klines = [klines[open_time] for open_time in sorted(klines)]
+            prices = self.upload.ingest_unit(unit, self.latest[unit], klines=klines, klines_closed=True)
+            if prices is None:
+                # The unit was rolled back, its klines are fetched by a catch-up on the next flush
+                self.needs_catch_up.add(unit)
+            elif len(prices) > 0:
+                committed[unit] = prices
+                self.latest[unit] = prices["datetime"].max().to_pydatetime()
+                STREAM_LAG_SECONDS.observe(time.time() - (int(klines[-1][6]) + 1) / 1000)
+        return committed
+
+    '''
+    Function Description: Main function utilized to write the buffered klines and notify commit listeners of every unit committed. Units
+                          which failed previously or whose buffered klines do not directly follow their latest entry, e.g. because the
+                          stream skipped an hour, are caught up from the REST API once the klines of every other unit are written. Klines
+                          are written as a single flight with every other ingest, see UploadData.run_single_flight, hence writing them is
+                          deferred by flush_interval seconds while an ingest of this or another process is running.
+    '''
+
+    def flush(self):
+        pending = self.pending
+        self.pending = {}
+        self.pending_since = None
+
+        for unit, klines in pending.items():
+            latest = self.latest.get(unit)
+            if latest is None or min(klines) > to_milliseconds(latest) + HOUR_MS:
+                self.needs_catch_up.add(unit)
+
+        ready = {unit: klines for unit, klines in pending.items() if unit not in self.needs_catch_up}
+        if ready:
+            committed = self.upload.run_single_flight(lambda: self.write(ready))
+            if committed is None:
+                self.defer(ready)
+            elif committed:
+                self.upload.notify_commit(committed)
+
+        if self.needs_catch_up:
+            self.catch_up({unit: klines for unit, klines in pending.items() if unit not in ready})
+
+    '''
+    Function Description: Coroutine utilized to receive klines until the stream is stopped. Connections which are closed or could not be
+                          opened are reopened with an exponential backoff. Database work is executed in a worker thread so the connection
+                          keeps responding to pings while a catch-up or flush is running, messages received meanwhile are buffered by the
+                          websocket connection.
+    '''
+
+    async def listen(self):
+        loop = asyncio.get_event_loop()
+        delay = self.reconnect_interval
+
+        while not self.stopped.is_set():
+            try:
+                async with websockets.connect(self.stream_url()) as websocket:
+                    delay = self.reconnect_interval
+                    # Klines closed while disconnected are only available from the REST API
+                    self.needs_catch_up.update(self.units)
+                    await loop.run_in_executor(None, self.catch_up)
+
+                    while not self.stopped.is_set():
+                        try:
+                            message = await asyncio.wait_for(websocket.recv(), timeout=self.flush_interval)
+                            kline = self.parse(message)
+                            if kline is not None:
+                                self.add(*kline)
+                        except asyncio.TimeoutError:
+                            pass
+
+                        if self.pending_since is not None and time.monotonic() - self.pending_since >= self.flush_interval:
+                            await loop.run_in_executor(None, self.flush)
+            except (websockets.exceptions.WebSocketException, OSError, asyncio.TimeoutError) as error:
+                if self.stopped.is_set():
+                    break
+                STREAM_RECONNECTS.inc()
+                print("Kline stream disconnected: " + str(error) + ", reconnecting in " + str(delay) + " seconds")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_interval)
+
+    '''
+    Function Description: Function utilized to start the stream in a background thread running its own event loop.
+    '''
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.listen()), name="stream-ingest", daemon=True)
+        self.thread.start()
+
+    '''
+    Function Description: Function utilized to stop the stream, waiting for the background thread to finish its current flush.
+    @param timeout => Maximum number of seconds to wait for the background thread
+    '''
+
+    def stop(self, timeout=None):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
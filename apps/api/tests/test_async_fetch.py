@@ -0,0 +1,137 @@
+from aiohttp import web
+from async_fetch import AsyncKlineFetcher, TokenBucket, HOUR_MS, KLINES_PATH, PAGE_LIMIT
+
+import asyncio
+import collections
+import threading
+import time
+import unittest
+
+'''
+Tests of the asynchronous kline fetcher against a local aiohttp server standing in for the Binance API. Run from apps/api with the
+environment configured in the same way as the API:
+    $ python -m unittest discover tests
+'''
+
+START_MS = 1514764800000
+
+'''
+Class Description: Local stand-in for the klines endpoint of the Binance API, running in its own event loop and thread as the fetcher
+                   runs an event loop of its own. Hourly klines are generated for the requested range, the behaviour of a unit can be
+                   overridden by a coroutine returning a response.
+'''
+
+
+class KlineServer():
+
+    def __init__(self):
+        super().__init__()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.requests = collections.Counter()
+        # Coroutines returning a response in place of the generated klines, keyed by unit
+        self.handlers = {}
+        self.runner = None
+        self.port = None
+
+    async def klines(self, request):
+        unit = request.query["symbol"]
+        self.requests[unit] += 1
+        if unit in self.handlers:
+            response = await self.handlers[unit](request, self.requests[unit])
+            if response is not None:
+                return response
+
+        start = int(request.query["startTime"])
+        end = int(request.query["endTime"])
+        open_times = range(start, end + 1, HOUR_MS)[:int(request.query["limit"])]
+        return web.json_response([[t, "1.0", "2.0", "0.5", "1.5", "3.0", t + HOUR_MS - 1] for t in open_times])
+
+    async def setup(self):
+        app = web.Application()
+        app.router.add_get(KLINES_PATH, self.klines)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+
+    def start(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.setup(), self.loop).result(5)
+        return "http://127.0.0.1:" + str(self.port)
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+
+class AsyncKlineFetcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = KlineServer()
+        self.base_url = self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_pages_are_fetched_in_order(self):
+        fetcher = AsyncKlineFetcher(base_url=self.base_url, concurrency=2)
+        end_ms = START_MS + (2 * PAGE_LIMIT + 500) * HOUR_MS
+        res = fetcher.fetch({"BTCUSDT": START_MS, "ETHUSDT": end_ms - 9 * HOUR_MS}, end_ms)
+
+        self.assertEqual(self.server.requests, {"BTCUSDT": 3, "ETHUSDT": 1})
+        self.assertEqual([kline[0] for kline in res["BTCUSDT"]], list(range(START_MS, end_ms + 1, HOUR_MS)))
+        self.assertEqual(len(res["ETHUSDT"]), 10)
+
+    def test_failed_page_cancels_the_other_pages(self):
+        async def failing(request, count):
+            if count == 1:
+                return web.Response(status=400, text="Invalid symbol")
+            # Every other page is retried for as long as it keeps running
+            await asyncio.sleep(0.05)
+            return web.Response(status=503)
+
+        async def slow(request, count):
+            await asyncio.sleep(1)
+
+        self.server.handlers = {"FAILUSDT": failing, "BTCUSDT": slow}
+        fetcher = AsyncKlineFetcher(base_url=self.base_url, max_retry=50, retry_interval=0.01)
+        end_ms = START_MS + (4 * PAGE_LIMIT - 1) * HOUR_MS
+        res = fetcher.fetch({"FAILUSDT": START_MS, "BTCUSDT": START_MS}, end_ms)
+
+        # The unit failed as a whole while the other unit was fetched, its remaining pages stopped retrying
+        self.assertEqual(list(res), ["BTCUSDT"])
+        self.assertEqual(len(res["BTCUSDT"]), 4 * PAGE_LIMIT)
+        self.assertLessEqual(self.server.requests["FAILUSDT"], 8)
+
+    def test_rate_limit_response_is_honoured(self):
+        async def limited(request, count):
+            if count == 1:
+                return web.Response(status=429, headers={"Retry-After": "0.3"})
+
+        self.server.handlers = {"BTCUSDT": limited}
+        fetcher = AsyncKlineFetcher(base_url=self.base_url, retry_interval=0.01)
+        started = time.monotonic()
+        res = fetcher.fetch({"BTCUSDT": START_MS}, START_MS + 23 * HOUR_MS)
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertEqual(self.server.requests["BTCUSDT"], 2)
+        self.assertEqual(len(res["BTCUSDT"]), 24)
+
+    def test_token_bucket_paces_requests(self):
+        async def acquire_all():
+            # 600 weight per minute refills 10 weight per second once the bucket is drained
+            bucket = TokenBucket(600)
+            bucket.drain()
+            started = time.monotonic()
+            for _ in range(5):
+                await bucket.acquire(1)
+            return time.monotonic() - started
+
+        self.assertGreaterEqual(asyncio.run(acquire_all()), 0.45)
+
+
+if __name__ == "__main__":
+    unittest.main()
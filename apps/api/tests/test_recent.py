@@ -0,0 +1,96 @@
+from recent import RecentEntries
+
+import pandas as pd
+import unittest
+
+'''
+Tests of the in-memory buffers of the latest entries. Run from apps/api:
+    $ python -m unittest discover tests
+'''
+
+HOUR_MS = 60 * 60 * 1000
+START_MS = 1620000000000 - 1620000000000 % HOUR_MS
+
+'''
+Function Description: A helper function utilized to build the rows returned by GetData.run_recent.
+@param unit => crypto unit of the rows
+@param hours => Range of hours after START_MS the rows are built for
+@return list => List of (unit, datetime, opening, closing, interpolated) rows
+'''
+
+
+def recent_rows(unit, hours):
+    return [(unit, START_MS + hour * HOUR_MS, float(hour), float(hour) + 0.5, False) for hour in hours]
+
+
+'''
+Function Description: A helper function utilized to build the entries of an ingest commit as passed to commit listeners.
+@param unit => crypto unit of the entries
+@param hours => Range of hours after START_MS the entries are built for
+@param closing => Closing price of every entry
+@return dictionary => Dictionary mapping the unit to the dataframe of entries committed
+'''
+
+
+def commit(unit, hours, closing):
+    return {unit: pd.DataFrame({
+        "datetime": pd.to_datetime([START_MS + hour * HOUR_MS for hour in hours], unit="ms"),
+        "opening": [float(hour) for hour in hours],
+        "closing": [closing] * len(hours),
+        "interpolated": [False] * len(hours)
+    })}
+
+
+'''
+Class Description: Stand-in for GetData returning fixed rows from run_recent, with a function called while the database is read.
+'''
+
+
+class StubGetData():
+
+    def __init__(self, rows, during_read=None):
+        super().__init__()
+        self.rows = rows
+        self.during_read = during_read
+
+    def run_recent(self, limit):
+        if self.during_read is not None:
+            self.during_read()
+        return self.rows
+
+
+class RecentEntriesTest(unittest.TestCase):
+
+    def test_commits_are_ignored_until_warmed(self):
+        recent = RecentEntries(capacity=4)
+        recent.append(commit("BTCUSDT", range(0, 2), 1.0))
+        self.assertIsNone(recent.get("BTCUSDT", 4))
+
+        self.assertTrue(recent.warm(StubGetData(recent_rows("BTCUSDT", range(0, 6)))))
+        res = recent.get("BTCUSDT", 10)
+        self.assertEqual(res["datetime"].tolist(), [START_MS + hour * HOUR_MS for hour in range(2, 6)])
+
+    def test_commit_during_warm_up_is_kept(self):
+        recent = RecentEntries(capacity=8)
+        # The commit lands after the database was read, its entries are missing from the rows returned
+        gd = StubGetData(recent_rows("BTCUSDT", range(0, 4)),
+                         during_read=lambda: recent.append(commit("BTCUSDT", range(3, 6), 9.0)))
+        self.assertTrue(recent.warm(gd))
+
+        res = recent.get("BTCUSDT", 8)
+        self.assertEqual(res["datetime"].tolist(), [START_MS + hour * HOUR_MS for hour in range(0, 6)])
+        self.assertEqual(res["closing"].tolist(), [0.5, 1.5, 2.5, 9.0, 9.0, 9.0])
+        self.assertEqual(recent.warming, [])
+
+        recent.append(commit("BTCUSDT", range(6, 7), 7.0))
+        self.assertEqual(recent.get("BTCUSDT", 1)["closing"].tolist(), [7.0])
+
+    def test_failed_warm_up_stops_recording(self):
+        recent = RecentEntries(capacity=4)
+        self.assertFalse(recent.warm(StubGetData(None)))
+        self.assertEqual(recent.warming, [])
+        self.assertFalse(recent.warmed)
+
+
+if __name__ == "__main__":
+    unittest.main()
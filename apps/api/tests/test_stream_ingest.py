@@ -0,0 +1,237 @@
+from datetime import datetime, timedelta
+from stream_ingest import StreamIngest
+from upload_data import to_milliseconds, HOUR_MS
+
+import asyncio
+import json
+import pandas as pd
+import time
+import unittest
+import websockets
+
+'''
+Tests of the kline stream ingest against a local websocket server standing in for the Binance combined stream endpoint. Run from
+apps/api with the environment configured in the same way as the API:
+    $ python -m unittest discover tests
+'''
+
+UNITS = ["BTCUSDT", "ETHUSDT"]
+LATEST = datetime(2021, 5, 1, 0, 0)
+
+'''
+Class Description: Stand-in for UploadData recording the catch-up runs, ingested klines and commits of the stream. Entries are held in
+                   memory as the latest datetime of every unit rather than written to a database.
+'''
+
+
+class StubUpload():
+
+    def __init__(self, run_results=None):
+        super().__init__()
+        self.latest = {unit: LATEST for unit in UNITS}
+        # Units failing in successive calls to run, None for a run skipped as another ingest is running. Further runs succeed
+        self.run_results = list(run_results or [])
+        self.failed_units = []
+        self.runs = 0
+        self.ingested = []
+        self.commits = []
+        # True while another ingest holds the single flight lock
+        self.locked = False
+
+    def run(self):
+        self.runs += 1
+        failed = self.run_results.pop(0) if self.run_results else []
+        if failed is None:
+            return None
+        self.failed_units = failed
+        return not failed
+
+    def run_single_flight(self, work):
+        return None if self.locked else work()
+
+    def connect(self):
+        return self
+
+    def cursor(self):
+        return None
+
+    def release(self, conn):
+        pass
+
+    def get_latest_entry(self, cursor):
+        return dict(self.latest)
+
+    def ingest_unit(self, unit, start_date, process_pool=None, klines=None, klines_closed=False):
+        self.ingested.append((unit, start_date, [int(kline[0]) for kline in klines], klines_closed))
+        prices = pd.DataFrame({"datetime": pd.to_datetime([int(kline[0]) for kline in klines], unit="ms")})
+        self.latest[unit] = prices["datetime"].max().to_pydatetime()
+        return prices
+
+    def notify_commit(self, prices):
+        self.commits.append(sorted(prices.keys()))
+
+
+'''
+Function Description: A helper function utilized to build a message of the combined stream holding an hourly kline.
+@param unit => crypto unit of the kline
+@param hours => Number of hours the kline opens after LATEST
+@param closed => True if the kline closed
+@return String => Serialized message
+'''
+
+
+def kline_message(unit, hours, closed=True):
+    open_time = to_milliseconds(LATEST) + hours * HOUR_MS
+    return json.dumps({
+        "stream": unit.lower() + "@kline_1h",
+        "data": {
+            "e": "kline",
+            "s": unit,
+            "k": {"t": open_time, "T": open_time + HOUR_MS - 1, "s": unit, "o": "1.0", "h": "2.0", "l": "0.5", "c": "1.5",
+                  "v": "3.0", "x": closed}
+        }
+    })
+
+
+'''
+Function Description: Coroutine utilized to wait until a condition holds.
+@param condition => Function returning True once the condition holds
+@param timeout => Maximum number of seconds to wait
+@return boolean => True if the condition holds
+'''
+
+
+async def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+class StreamIngestTest(unittest.TestCase):
+
+    def test_parse_ignores_open_klines(self):
+        stream = StreamIngest(StubUpload(), units=UNITS)
+        self.assertIsNone(stream.parse(kline_message("BTCUSDT", 1, closed=False)))
+        unit, kline = stream.parse(kline_message("BTCUSDT", 1))
+        self.assertEqual(unit, "BTCUSDT")
+        self.assertEqual(kline[0], to_milliseconds(LATEST) + HOUR_MS)
+        self.assertIsNone(stream.parse("not json"))
+
+    def test_failed_units_are_caught_up_while_others_are_written(self):
+        upload = StubUpload(run_results=[["ETHUSDT"], ["ETHUSDT"]])
+        stream = StreamIngest(upload, units=UNITS)
+        stream.catch_up()
+        self.assertEqual(stream.needs_catch_up, {"ETHUSDT"})
+        self.assertEqual(stream.latest, upload.latest)
+
+        # The kline of the healthy unit is written from the stream, the failed unit is caught up again from the REST API
+        stream.add(*stream.parse(kline_message("BTCUSDT", 1)))
+        stream.add(*stream.parse(kline_message("ETHUSDT", 1)))
+        stream.flush()
+        self.assertEqual(upload.ingested, [("BTCUSDT", LATEST, [to_milliseconds(LATEST) + HOUR_MS], True)])
+        self.assertEqual(upload.commits, [["BTCUSDT"]])
+        self.assertEqual(upload.runs, 2)
+        self.assertEqual(stream.needs_catch_up, {"ETHUSDT"})
+
+        stream.add(*stream.parse(kline_message("BTCUSDT", 2)))
+        stream.add(*stream.parse(kline_message("ETHUSDT", 2)))
+        stream.flush()
+        self.assertEqual(len(upload.ingested), 2)
+        self.assertEqual(upload.runs, 3)
+        self.assertEqual(stream.needs_catch_up, set())
+        self.assertEqual(stream.pending, {})
+
+    def test_skipped_catch_up_keeps_klines(self):
+        upload = StubUpload(run_results=[None, None])
+        stream = StreamIngest(upload, units=UNITS)
+        stream.catch_up()
+        self.assertEqual(stream.needs_catch_up, set(UNITS))
+
+        # Another ingest is running, the klines are kept until a catch-up completes
+        stream.add(*stream.parse(kline_message("BTCUSDT", 1)))
+        stream.flush()
+        self.assertEqual(upload.runs, 2)
+        self.assertIn("BTCUSDT", stream.pending)
+        self.assertIsNotNone(stream.pending_since)
+
+        stream.flush()
+        self.assertEqual(upload.runs, 3)
+        self.assertEqual(stream.needs_catch_up, set())
+        self.assertEqual(stream.pending, {})
+        self.assertEqual(upload.ingested, [])
+
+    def test_flush_is_deferred_while_ingest_is_running(self):
+        upload = StubUpload()
+        stream = StreamIngest(upload, units=UNITS)
+        stream.catch_up()
+        stream.add(*stream.parse(kline_message("BTCUSDT", 1)))
+
+        upload.locked = True
+        stream.flush()
+        self.assertEqual(upload.ingested, [])
+        self.assertIn("BTCUSDT", stream.pending)
+        self.assertIsNotNone(stream.pending_since)
+
+        upload.locked = False
+        stream.flush()
+        self.assertEqual(upload.ingested, [("BTCUSDT", LATEST, [to_milliseconds(LATEST) + HOUR_MS], True)])
+        self.assertEqual(upload.commits, [["BTCUSDT"]])
+        self.assertEqual(stream.pending, {})
+
+    def test_stream(self):
+        upload = StubUpload()
+        connections = []
+
+        async def run():
+            messages = asyncio.Queue()
+
+            # Websocket handlers receive the request path as a second argument in older websockets releases
+            async def handler(websocket, *args):
+                connections.append(websocket)
+                while True:
+                    message = await messages.get()
+                    if message is None:
+                        await websocket.close()
+                        return
+                    await websocket.send(message)
+
+            async with websockets.serve(handler, "127.0.0.1", 0) as server:
+                port = server.sockets[0].getsockname()[1]
+                stream = StreamIngest(upload, base_url="ws://127.0.0.1:" + str(port), units=UNITS, flush_interval=0.2,
+                                      reconnect_interval=0.1)
+                stream.start()
+                try:
+                    # Connecting catches up from the REST API
+                    self.assertTrue(await wait_until(lambda: upload.runs == 1 and not stream.needs_catch_up))
+
+                    # Klines closing before the flush are written together, one ingest per unit and a single commit
+                    for message in [kline_message("BTCUSDT", 1), kline_message("BTCUSDT", 2, closed=False),
+                                    kline_message("ETHUSDT", 1), kline_message("BTCUSDT", 1), kline_message("BTCUSDT", 2)]:
+                        await messages.put(message)
+                    self.assertTrue(await wait_until(lambda: len(upload.commits) == 1))
+                    first_hour = to_milliseconds(LATEST) + HOUR_MS
+                    self.assertEqual(sorted(upload.ingested), [
+                        ("BTCUSDT", LATEST, [first_hour, first_hour + HOUR_MS], True),
+                        ("ETHUSDT", LATEST, [first_hour], True)
+                    ])
+                    self.assertEqual(upload.commits, [UNITS])
+                    self.assertEqual(stream.latest["BTCUSDT"], LATEST + timedelta(hours=2))
+                    self.assertEqual(upload.runs, 1)
+
+                    # Klines closed while disconnected are caught up once the stream reconnects
+                    await messages.put(None)
+                    self.assertTrue(await wait_until(lambda: len(connections) == 2 and upload.runs == 2))
+                finally:
+                    stream.stopped.set()
+                    await messages.put(None)
+                    await asyncio.get_event_loop().run_in_executor(None, stream.stop, 5)
+                self.assertFalse(stream.thread.is_alive())
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,159 @@
 from binance.client import Client
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 from dotenv import dotenv_values
 from env.units import SCRAP_UNITS, DEFAULT_START_DATE
-
+from db_pool import get_pool, PoolError
+from bulk_load import write_frame
+from rollups import refresh_rollups
+from async_fetch import AsyncKlineFetcher, BINANCE_API_URL
+from metrics import Counter, Gauge, Histogram
+from profiler import SamplingProfiler
+
+import calendar
 import psycopg2
 import numpy as np
 import pandas as pd
-import sys
+import threading
+import time
+
+# Columns of the entries and rolling_returns tables written by the ingest, matching the dataframe column names
+ENTRY_COLUMNS = ["unit", "datetime", "opening", "closing", "interpolated"]
+ROLLING_COLUMNS = ["date", "opening", "closing", "unit"]
+# Unique keys of the entries and rolling_returns tables, rows are upserted on these keys so rewriting a row is idempotent
+ENTRY_KEY = ["unit", "datetime"]
+ROLLING_KEY = ["unit", "date"]
+HOUR_MS = 60 * 60 * 1000
+# Number of known data points on either side of a run of missing data points utilized to interpolate it
+INTERPOLATION_WINDOW = 100
+# Key of the advisory lock held for the duration of an ingest run, so API processes sharing a database never ingest concurrently
+INGEST_LOCK_ID = 7321584002
+
+# Ingest metrics exposed by the /metrics endpoint
+INGEST_RUN_SECONDS = Histogram(
+    "byenance_ingest_run_seconds", "Duration of complete ingest runs")
+INGEST_STAGE_SECONDS = Histogram(
+    "byenance_ingest_stage_seconds", "Duration of each ingest stage per unit", labels=("stage", "unit"))
+INGEST_ROWS = Counter(
+    "byenance_ingest_rows_written_total", "Rows written by the ingest per table and unit", labels=("table", "unit"))
+INGEST_INTERPOLATED = Counter(
+    "byenance_ingest_interpolated_total", "Missing hourly data points filled by interpolation per unit", labels=("unit",))
+INGEST_FAILURES = Counter(
+    "byenance_ingest_failures_total", "Unit ingests which failed and were rolled back", labels=("unit",))
+INGEST_LAST_COMMIT = Gauge(
+    "byenance_ingest_last_commit_timestamp_seconds", "Time of the latest successful ingest commit per unit", labels=("unit",))
+INGEST_SKIPPED = Counter(
+    "byenance_ingest_runs_skipped_total", "Ingest runs and stream flushes skipped as another ingest was in progress in this or another process")
+
+'''
+Function Description: A helper function used to convert a datetime object into milliseconds since epoch. Datetime objects without a
+                      timezone, such as DEFAULT_START_DATE, are interpreted as UTC in the same way as the Binance API.
+@param value => datetime object to be converted
+@return int => Milliseconds since epoch
+'''
+
+
+def to_milliseconds(value):
+    if value.tzinfo is None:
+        return calendar.timegm(value.timetuple()) * 1000
+    return int(value.timestamp() * 1000)
+
+
+'''
+Function Description: A helper function used to interpolate every run of missing data points in place. Rather than interpolating
+                      the whole series, each run is interpolated from at most INTERPOLATION_WINDOW known data points on either side,
+                      hence the work done is proportional to the number of missing data points rather than the length of the series.
+@param values => Numpy array of prices in which missing data points are NaN
+'''
+
+
+def fill_gaps(values):
+    missing = np.isnan(values)
+    if not missing.any():
+        return
+
+    # The start and end of each run of missing data points are found from the changes in the missing mask
+    edges = np.diff(np.concatenate(([0], missing.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    known = values.copy()
+
+    for start, end in zip(starts, ends):
+        lower = max(start - INTERPOLATION_WINDOW, 0)
+        upper = min(end + INTERPOLATION_WINDOW, len(values))
+        window = pd.Series(known[lower:upper])
+
+        # A polynomial interpolation method was chosen due to the trend of crypto prices.
+        # As crypto prices are very volatile, there is not clear or visible trend of the graph.
+        # Hence, we opted for a polynomial interpolation method as it would provide a better approximation of the
+        # crypto price trend as compared to a linear interpolation method.
+        if window.notna().sum() > 2:
+            window = window.interpolate(method='polynomial', order=2)
+        else:
+            window = window.interpolate()
+        values[start:end] = window.to_numpy()[start - lower:end - lower]
+
+
+'''
+Function Description: Function used to convert the klines of a unit into hourly prices and interpolate missing data points. Missing 
+                      data points are identified vectorially by placing every kline at its hour within a complete hourly range. The 
+                      function does not access the database or the Binance API, allowing it to be executed in a separate worker process.
+@param unit => crypto unit the klines belong to
+@param start_date => datetime object of the lastest entry found in the database for the unit, klines up to this datetime are skipped
+@param klines => List of hourly klines returned by the Binance API
+@param statistical_data => List of the latest (datetime, opening, closing) entries stored for the unit returned by 
+                           UploadData.get_statistical_data, utilized as context when interpolating missing data points following them
+@return DataFrame => Dataframe containing the price data of the unit
+@return list => List containing the date objects which are representative of a new day. A new day is defined by a data point at hour 00:00
+'''
+
+
+def interpolate_klines(unit, start_date, klines, statistical_data):
+    start_hour = to_milliseconds(start_date) // HOUR_MS
+    values = np.array([kline[:3] for kline in klines], dtype=np.float64).reshape(-1, 3)
+
+    # Open times are truncated to the hour and data points already found on the database are skipped
+    hours = values[:, 0].astype(np.int64) // HOUR_MS
+    new = hours > start_hour
+    hours = hours[new]
+    values = values[new]
+
+    # No new data points are available for the unit
+    if len(hours) == 0:
+        return (pd.DataFrame(columns=ENTRY_COLUMNS), [])
+
+    # Units with stored entries continue from the hour following their latest entry so missing data points at the start 
+    # of the klines are filled as well, whereas new units start at their first available kline
+    first_hour = start_hour + 1 if statistical_data else hours[0]
+    all_hours = np.arange(first_hour, hours[-1] + 1)
+    positions = hours - first_hour
+
+    # Missing data points are left as NaN placeholders which are filled during interpolation 
+    context = np.array([[entry[1], entry[2]] for entry in statistical_data], dtype=np.float64).reshape(-1, 2)
+    prices = np.full((len(context) + len(all_hours), 2), np.nan)
+    prices[:len(context)] = context
+    prices[len(context) + positions] = values[:, 1:]
+    interpolated = np.ones(len(all_hours), dtype=int)
+    interpolated[positions] = 0
+
+    if interpolated.any():
+        fill_gaps(prices[:, 0])
+        fill_gaps(prices[:, 1])
+    prices = prices[len(context):].round(2)
+
+    datetimes = pd.to_datetime(all_hours * HOUR_MS, unit="ms", utc=True)
+    prices = pd.DataFrame({
+        "unit": unit,
+        "datetime": datetimes,
+        "opening": prices[:, 0],
+        "closing": prices[:, 1],
+        "interpolated": interpolated
+    }, columns=ENTRY_COLUMNS)
+
+    # Every data point at hour 00:00 closes the rolling period of a new day
+    rolling_datetimes = list(datetimes[all_hours % 24 == 0].date)
+    return (prices, rolling_datetimes)
+
 
 '''
 Class Description: The class is responsible for running the algorithm responsible for scrapping data from the binance API. 
@@ -16,166 +163,171 @@ Class Description: The class is responsible for running the algorithm responsibl
 
 class UploadData():
 
-    def __init__(self):
+    def __init__(self, client=None, pool=None):
         super().__init__()
         api = dotenv_values("./env/api.env")
-        self.client = Client(api["API"], api["SECRET"])
-        db = dotenv_values("./env/db.env")
-        self.db_env = {
-            "host": db["POSTGRES_HOST"],
-            "database": db["POSTGRES_DB"],
-            "user": db["POSTGRES_USER"],
-            "password": db["POSTGRES_PASSWORD"]
-        }
+        # Any object providing get_historical_klines can be supplied in place of the Binance client, e.g. to ingest offline
+        self.client = client if client is not None else Client(api["API"], api["SECRET"])
+        # Number of units ingested concurrently and number of worker processes utilized for interpolation,
+        # interpolation is executed within the ingest threads when no worker processes are configured
+        self.workers = int(api.get("INGEST_WORKERS") or 4)
+        self.processes = int(api.get("INGEST_PROCESSES") or 0)
+        # Setting INGEST_FETCHER=async fetches the klines of every unit concurrently before they are ingested,
+        # BINANCE_API_URL allows a local server to stand in for the Binance API
+        self.fetcher = None
+        if api.get("INGEST_FETCHER") == "async":
+            self.fetcher = AsyncKlineFetcher(
+                base_url=api.get("BINANCE_API_URL") or BINANCE_API_URL,
+                weight_per_minute=int(api.get("BINANCE_WEIGHT_LIMIT") or 1200),
+                concurrency=int(api.get("FETCH_CONCURRENCY") or 10))
+        # Connections are checked out of the pool shared by every class accessing the database unless a pool is supplied
+        self.pool = pool if pool is not None else get_pool()
+        # Functions called after every successful commit, e.g. to invalidate cached API responses
+        self.commit_listeners = []
+        # Held for the duration of a run so overlapping runs of this process are skipped rather than racing on the same inserts
+        self.run_lock = threading.Lock()
+        # Ingest progress of every unit in the current or latest run, together with the time the latest run completed
+        self.progress_lock = threading.Lock()
+        self.progress = {}
+        self.last_run = None
+        # Units which failed in the latest run, reported by get_progress so units failing on every run are visible
+        self.failed_units = []
+        # Setting INGEST_PROFILE_INTERVAL to a sampling interval in seconds writes a collapsed stack profile of every ingest run
+        # to INGEST_PROFILE_DIR, the profiler is disabled by default
+        self.profiler = None
+        profile_interval = float(api.get("INGEST_PROFILE_INTERVAL") or 0)
+        if profile_interval > 0:
+            self.profiler = SamplingProfiler(
+                interval=profile_interval, output_dir=api.get("INGEST_PROFILE_DIR") or "./profiles")
 
     '''
-    Function Description: A helper function utilize to connect to the PostgreSQL instance 
-    @return Connection => A connection object to PostgreSQL instance is returned 
-                          utilizing the environment variables set in ./env/database.env
+    Function Description: A helper function utilize to register a function which is called after new data is committed to the database.
+    @param listener => Function called with a dictionary mapping each updated unit to the dataframe of entries committed
+    '''
+
+    def add_commit_listener(self, listener):
+        self.commit_listeners.append(listener)
+
+    '''
+    Function Description: A helper function utilize to notify every registered commit listener. Failures of a listener are reported
+                          without affecting the other listeners as the data has already been committed.
+    @param prices => Dictionary mapping each updated unit to the dataframe of entries committed
+    '''
+
+    def notify_commit(self, prices):
+        for listener in self.commit_listeners:
+            try:
+                listener(prices)
+            except Exception as error:
+                print(error)
+
+    '''
+    Function Description: A helper function utilize to record the ingest progress of a unit.
+    @param unit => crypto unit the progress belongs to
+    @param state => Ingest stage of the unit, one of pending, fetching, interpolating, writing, done or failed
+    @param latest => Optional datetime object of the latest entry stored for the unit
+    '''
+
+    def set_progress(self, unit, state, latest=None):
+        with self.progress_lock:
+            progress = self.progress.setdefault(unit, {"latest": None})
+            progress["state"] = state
+            if latest is not None:
+                progress["latest"] = latest
+
+    '''
+    Function Description: Function utilized to obtain a snapshot of the ingest progress, reported by the /health and /ready endpoints.
+                          The number of hours each unit is behind is derived from its latest entry, hence it shrinks as a backfill commits.
+    @return dictionary => Dictionary containing whether a run is in progress, the time the latest run completed, the units which failed in
+                          the latest run and the progress of every unit
+    '''
+
+    def get_progress(self):
+        current_time = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        with self.progress_lock:
+            units = {}
+            for unit, progress in self.progress.items():
+                latest = progress["latest"]
+                if latest is not None and latest.tzinfo is None:
+                    latest = latest.replace(tzinfo=timezone.utc)
+                units[unit] = {
+                    "state": progress["state"],
+                    "latest": latest.isoformat() if latest is not None else None,
+                    "hours_behind": max(int((current_time - latest).total_seconds() // 3600) - 1, 0) if latest is not None else None
+                }
+            return {
+                "running": self.run_lock.locked(),
+                "last_run": self.last_run.isoformat() if self.last_run is not None else None,
+                "failed_units": list(self.failed_units),
+                "units": units
+            }
+
+    '''
+    Function Description: A helper function utilize to check a connection to the PostgreSQL instance out of the shared connection pool
+    @return Connection => A connection object to PostgreSQL instance is returned, None is returned if no connection could be obtained 
+                          as failures are reported to the caller rather than terminating the worker
     '''
 
     def connect(self):
         conn = None
         try:
-            conn = psycopg2.connect(**self.db_env)
-        except (Exception, psycopg2.DatabaseError) as error:
+            conn = self.pool.getconn()
+        except PoolError as error:
             print(error)
-            sys.exit(1)
         return conn
 
     '''
-    Function Description: A helper function utilize to convert specified python datetime objects into a format 
-                          understandable by the Binance API. 
-    @return String => String representation of Binance API format of datetime inputs.         
+    Function Description: A helper function utilize to return a connection to the shared connection pool
+    @param conn => Connection object obtained from connect
     '''
 
-    def parse_datetime(self, datetime):
-        months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
-                  'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-        return ' '.join([str(datetime.day), months[datetime.month - 1] + ',', str(datetime.year)])
+    def release(self, conn):
+        self.pool.putconn(conn)
 
     '''
     Function Description: A helper function utilize to fetch previously inserted entries on the database. 
-                          This function is called in the instance where the scheduler recieves missing data points and has 
-                          < 100 data points. The intuition behind fetching more legacy data from the database was that 
-                          a larger dataset would provide a better approximation of the interpolation polynomial curve. Hence,
-                          providing a more accurate approximation of prices at the missing data points and accomadating for statistical significance. 
-    @return list => A list containing the previous 100 legacy data from the suppoesed datetime of the missing data point.       
+                          The entries are utilized as context when interpolating missing data points directly following the latest entry.
+                          The intuition behind fetching more legacy data from the database was that a larger dataset would provide 
+                          a better approximation of the interpolation polynomial curve. Hence, providing a more accurate approximation 
+                          of prices at the missing data points and accomadating for statistical significance. 
+    @return list => A list containing the latest INTERPOLATION_WINDOW (datetime, opening, closing) entries of the unit ordered by datetime.
     '''
 
     def get_statistical_data(self, unit, cursor):
-        statement = "SELECT * from entries where unit = %s order by datetime desc limit 100"
-        statistical_data = []
-        cursor.execute(statement, (unit,))
+        statement = "SELECT datetime, opening, closing from entries where unit = %s order by datetime desc limit %s"
+        cursor.execute(statement, (unit, INTERPOLATION_WINDOW,))
         entries = cursor.fetchall()
-
-        for entry in entries:
-            opening = entry[3]
-            closing = entry[4]
-            # Data points excluding the opening and closing price are inserted as NaN
-            # This allows us to easily filter out the added data points after interpolation 
-            statistical_data.append(
-                [np.nan, np.nan, opening, closing, np.nan])
-
-        return statistical_data
+        entries.reverse()
+        return entries
 
     '''
-    Function Description: Main function used to fetch and interpolate data from the Binance API. 
-    @param unit_start_datetimes => Dictionary containing start datetime object the function should query from to update the database upon first request of the flask server and hourly updates.
-                                   Start datetime object is representative of the lastest entry found in the database for each unit. 
-    @param cursor => Cursor object utilized for SQL statement executions.
-    @return dictionary => Dictionary containing the mapping of each unit and their respective price data stored in a dataframe.
-    @return dictionary => List containing the datetime objects which are representative of a new day. A new day is defined by a data point at hour 00:00
-    '''
-
-    def get_and_interpolate(self, unit_start_datetimes, cursor):
-        all_prices = {}
-        # Iterate through all units defined in .env/units.py
-        for unit in unit_start_datetimes.keys():
-            start_date = unit_start_datetimes[unit]
-            converted_start_date = self.parse_datetime(start_date)
-
-            # Fetching historical kline data from binance api 
-            klines = self.client.get_historical_klines(
-                unit, Client.KLINE_INTERVAL_1HOUR, converted_start_date)
-
-            # Iterate through data points that are already found on database based on their datetime 
-            start_idx = 0
-            curr_date = datetime.fromtimestamp(int(klines[start_idx][0])/1000)
-            while curr_date <= start_date:
-                start_idx += 1
-                curr_date = datetime.fromtimestamp(
-                    int(klines[start_idx][0])/1000)
-
-            prices = []
-            delta = timedelta(hours=1)
-            rolling_datetimes = []
-
-            # Initialize variable that would be used to compare difference between two datetime objects 
-            # This is required as it allows us to identify and insert missing hourly data points by checking 
-            # whether the time difference is more than 60 minutes 
-            init = klines[start_idx]
-            prev = datetime.fromtimestamp(int(init[0])/1000)
-            prices.append([unit, prev, float(init[1]), float(init[2]), 0])
-            missing_data_point_present = False
-
-            for i in klines[start_idx + 1:]:
-                # Replacing the current seen timestamp to only contain the hour to make for an easier comparison 
-                timestamp = datetime.fromtimestamp(
-                    int(i[0])/1000).replace(minute=0, second=0, microsecond=0)
-                time_diff = round(int((timestamp - prev).total_seconds()) / 60)
-                if timestamp.hour == 0:
-                    rolling_datetimes.append(timestamp.date())
-
-                if time_diff > 60:
-                    missing_data_points = round(time_diff / 60) - 1
-                    missing_data_point_present = True
-
-                    # Inserting missing data points with NaN placeholders which are identifiable via pandas during interpolation 
-                    for _ in range(missing_data_points):
-                        missing_datetime = prev + delta
-                        if missing_datetime.hour == 0:
-                            rolling_datetimes.append(missing_datetime.date())
-                        prices.append(
-                            [unit, missing_datetime, np.nan, np.nan, 1])
-                        prev = missing_datetime
-
-                # Inserting current data point seen
-                prices.append([unit, timestamp, float(i[1]), float(i[2]), 0])
-                prev = timestamp
-
-            # Identifying whether current data is sufficiently large to accomadate for statistical significance during interpolation 
-            # If true, previously inserted data points based on the datetime are fetched and pre-pended to the list 
-            appended_statistical_data = False
-            if missing_data_point_present and len(prices) <= 100:
-                statistical_data = self.get_statistical_data(unit, cursor)
-                prices = statistical_data + prices
-                appended_statistical_data = True
-
-            # Conversion of list to a dataframe object 
-            prices = pd.DataFrame(prices, dtype="float64",
-                                  columns=["unit", "datetime", "opening", "closing", "interpolated"])
-
-            # A polynomial interpolation method was chosen due to the trend of crypto prices.
-            # As crypto prices are very volatile, there is not clear or visible trend of the graph.
-            # Hence, we opted for a polynomial interpolation method as it would provide a better approximation of the
-            # crypto price trend as compared to a linear interpolation method.
-            prices["opening"] = prices["opening"].interpolate(
-                method='polynomial', order=2).round(2)
-            prices["closing"] = prices["closing"].interpolate(
-                method='polynomial', order=2).round(2)
+    Function Description: A helper function used to fetch the hourly klines of a unit from the Binance API. 
+    @param unit => crypto unit to be fetched
+    @param start_date => datetime object of the lastest entry found in the database for the unit
+    @return list => List of hourly klines returned by the Binance API
+    '''
 
-            # Removing previously inserted data points to accomadate for statistical significance 
-            # Removal is relatively easy as all current data entries are ensured to contain a unit whereas 
-            # added data entries have NaN as a unit allowing us to easily filter out added data entries. 
-            if appended_statistical_data:
-                prices = prices[prices['unit'].notna()]
+    def fetch_klines(self, unit, start_date):
+        # Fetching historical kline data from binance api, starting at the hour following the latest entry
+        return self.client.get_historical_klines(
+            unit, Client.KLINE_INTERVAL_1HOUR, to_milliseconds(start_date) + HOUR_MS, limit=1000)
 
-            prices["interpolated"] = prices['interpolated'].astype(int)
+    '''
+    Function Description: A helper function used to fetch the klines of every unit concurrently with the asynchronous fetcher.
+                          Klines are fetched from the hour following the latest entry, matching the range requested by fetch_klines.
+    @param unit_start_datetimes => Dictionary containing the datetime object of the lastest entry found in the database for each unit
+    @return dictionary => Dictionary containing the klines of each unit fetched successfully, None if no asynchronous fetcher is configured
+    '''
 
-            # Adding dataframe to corresponding unit key in the dictionary 
-            all_prices[unit] = prices
-        return (all_prices, rolling_datetimes)
+    def prefetch_klines(self, unit_start_datetimes):
+        if self.fetcher is None:
+            return None
+        unit_start_times = {}
+        for unit, start_date in unit_start_datetimes.items():
+            unit_start_times[unit] = to_milliseconds(start_date) + HOUR_MS
+        # The klines of every unit are fetched together, hence the stage is recorded once for all units
+        with INGEST_STAGE_SECONDS.time(stage="prefetch", unit="all"):
+            return self.fetcher.fetch(unit_start_times)
 
     '''
     Function Description: A helper function utilize to fetch the datetime of the last inserted entry on the database for each unit 
@@ -187,8 +339,16 @@ class UploadData():
     '''
 
     def get_latest_entry(self, cursor):
-        statement = "SELECT DISTINCT ON (unit) unit, datetime FROM entries ORDER BY unit, datetime DESC"
-        current_time = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        # Rather than reading every entry, the distinct units are found by repeatedly seeking the next unit on the (unit, datetime) key
+        # and the latest datetime of each unit is read from the end of its range of the key, so the cost is proportional to the
+        # number of units instead of the number of entries
+        statement = (
+            "WITH RECURSIVE units AS ("
+            "SELECT min(unit) AS unit FROM entries "
+            "UNION ALL "
+            "SELECT (SELECT min(unit) FROM entries WHERE unit > units.unit) FROM units WHERE units.unit IS NOT NULL) "
+            "SELECT unit, (SELECT max(datetime) FROM entries WHERE entries.unit = units.unit) FROM units WHERE unit IS NOT NULL")
+        current_time = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
         res = {}
 
         cursor.execute(statement)
@@ -212,119 +372,320 @@ class UploadData():
 
         return res
 
+    '''
+    Function Description: A helper function utilize to create the yearly partitions of the entries table the ingest is about to write to.
+                          Partitions are created before any unit is ingested and committed separately, as creating a partition locks the 
+                          entries table and would otherwise wait on the transactions of the units being ingested concurrently.
+    @param cursor => Cursor object utilized for SQL statement executions.
+    @param start_dates => datetime objects of the lastest entry found in the database for each unit to be ingested
+    '''
+
+    def ensure_partitions(self, cursor, start_dates):
+        start_dates = list(start_dates)
+        if not start_dates:
+            return
+        # The following year is created in advance so entries are never written to the default partition around new year
+        first_year = min(start_date.year for start_date in start_dates)
+        last_year = datetime.now(timezone.utc).year + 1
+        cursor.execute("SELECT ensure_entries_partition(year) FROM generate_series(%s, %s) AS year", (first_year, last_year))
+
     '''
     Function Description: Main function utilize to calculate the daily returns based on daily rolling hourly returns based on previously 
-                          inserted daily entries for the provided date object. 
-    @param end_period => date object which represents the 00:00 hour of a new day
+                          inserted daily entries for all of the provided date objects. Rather than issuing a query per day and summing 
+                          the hourly returns in Python, a single windowed query assigns every entry to the day it closes, computes the hourly 
+                          returns with LAG over that day and sums them per day, so backfilling years of data costs one round trip per unit.
+                          The hourly returns are computed with 20 decimal places to reproduce the precision of the previous Decimal arithmetic.
+    @param end_periods => List of date objects which represent the 00:00 hour of a new day
     @param cursor => Cursor object utilized for SQL statement executions.
     @param unit => crypto unit utilized to query the database 
-    @return float => float object representing rolling returns based on opening prices 
-    @return float => float object representing rolling returns based on closing prices 
+    @return list => List containing a [date, rolling opening return, rolling closing return, unit] row for each day with entries
     '''
 
-    def get_rolling_profit(self, end_period, cursor, unit):
+    def get_rolling_profits(self, end_periods, cursor, unit):
+        if not end_periods:
+            return []
+
         delta = timedelta(days=1)
-        start_period = end_period - delta
-        # Fetching previously inserted entries stored on the database 
-        statement = "select         \
-                        id,         \
-                        datetime,   \
-                        opening,    \
-                        closing     \
-                    from entries    \
-                    where           \
-                    datetime > %s   \
-                    and             \
-                    datetime <= %s  \
-                    and             \
-                    unit = %s"
-
-        cursor.execute(statement, (start_period, end_period, unit,))
-        period_entries = cursor.fetchall()
-        prev_entry = period_entries[0]
-
-        # Algorithm utilized to calculate rolling returns 
-        # An iterative approach was opted for to accomadate for the hourly updates to the database 
-        total_percentile_diff_open, total_percentile_diff_close = 0, 0
-        for curr_entry in period_entries[1:]:
-            prev_entry_open_start, prev_entry_close_start = prev_entry[2], prev_entry[3]
-
-            total_percentile_diff_open += (
-                curr_entry[2] - prev_entry_open_start) * 100 / prev_entry_open_start
-            total_percentile_diff_close += (
-                curr_entry[3] - prev_entry_close_start) * 100 / prev_entry_close_start
-
-            prev_entry = curr_entry
-
-        rolling_open = round(total_percentile_diff_open /
-                             len(period_entries), 6)
-        rolling_close = round(
-            total_percentile_diff_close / len(period_entries), 6)
-        return (rolling_open, rolling_close)
+        # Each entry belongs to the period (previous day 00:00, day 00:00], hence the day is obtained by truncating 
+        # the datetime just before it and adding a day. The hourly return of the first entry of each day is NULL and ignored by SUM.
+        statement = "with periods as (                                                                  \
+                        select                                                                          \
+                            datetime,                                                                   \
+                            opening,                                                                    \
+                            closing,                                                                    \
+                            (date_trunc('day', datetime - interval '1 microsecond')                     \
+                                + interval '1 day')::date as end_period                                 \
+                        from entries                                                                    \
+                        where                                                                           \
+                        unit = %s                                                                       \
+                        and                                                                             \
+                        datetime > %s                                                                   \
+                        and                                                                             \
+                        datetime <= %s                                                                  \
+                    ),                                                                                  \
+                    changes as (                                                                        \
+                        select                                                                          \
+                            end_period,                                                                 \
+                            (opening - lag(opening) over w) * 100.00000000000000000000                  \
+                                / lag(opening) over w as open_change,                                   \
+                            (closing - lag(closing) over w) * 100.00000000000000000000                  \
+                                / lag(closing) over w as close_change                                   \
+                        from periods                                                                    \
+                        window w as (partition by end_period order by datetime)                         \
+                    )                                                                                   \
+                    select                                                                              \
+                        end_period,                                                                     \
+                        coalesce(sum(open_change), 0),                                                  \
+                        coalesce(sum(close_change), 0),                                                 \
+                        count(*)                                                                        \
+                    from changes                                                                        \
+                    where end_period = any(%s)                                                          \
+                    group by end_period                                                                 \
+                    order by end_period"
+
+        cursor.execute(statement, (unit, min(end_periods) - delta,
+                                   max(end_periods), list(end_periods),))
+        rolling_values = []
+
+        for end_period, total_percentile_diff_open, total_percentile_diff_close, count in cursor.fetchall():
+            rolling_open = round(total_percentile_diff_open / count, 6)
+            rolling_close = round(total_percentile_diff_close / count, 6)
+            rolling_values.append([end_period, rolling_open, rolling_close, unit])
+        return rolling_values
 
     '''
-    Function Description: The main algorithm utilized to automatically populate the database with data scrapped from binance and 
-                          the daily returns calculated. This algorithm is utilized in both the hourly ingest and the start up ingest 
-                          which allow the database to be updated on an hourly basis and when the application first starts up. It should be
-                          noted that the Connect and Cursor objects for the SQL database are specified here and passed in as parameters to the
-                          respective helper functions. This prevent multiple Cursor objects to be initialize making it easier to mantain the number 
-                          of active connections to the database. This is because the entire algorithm within this function is wrapped in a 
-                          try, catch and finally block which will always clsoe the database connection whether the run was successful or not.
+    Function Description: A helper function utilize to write the price data of a unit, the rolling returns of its new days and its rollups to the database.
+    @param cursor => Cursor object utilized for SQL statement executions.
+    @param unit => crypto unit the price data belongs to
+    @param prices => Dataframe containing the price data of the unit
+    @param rolling_datetimes => List of date objects of the new days, representing the 00:00 hour of each day
     '''
 
-    def run(self):
-        conn = self.connect()
-        cursor = conn.cursor()
+    def write_prices(self, cursor, unit, prices, rolling_datetimes):
+        # Bulk write of entries to reduce network transfer cost and database load
+        # Large frames such as the initial backfill are streamed with a single COPY statement whereas
+        # the hourly increments are written with a batched INSERT statement.
+        with INGEST_STAGE_SECONDS.time(stage="insert", unit=unit):
+            write_frame(cursor, "entries", ENTRY_COLUMNS, prices,
+                        template="(%s, %s, %s, %s, CAST(%s as BOOLEAN))", key=ENTRY_KEY)
+        INGEST_ROWS.inc(len(prices), table="entries", unit=unit)
+        if len(prices) > 0:
+            INGEST_INTERPOLATED.inc(int(prices["interpolated"].sum()), unit=unit)
+
+        # Calculation of the daily returns of every new day in a single query
+        # Entries written above are visible to the query as it runs within the same transaction
+        with INGEST_STAGE_SECONDS.time(stage="rolling", unit=unit):
+            rolling_values = self.get_rolling_profits(
+                rolling_datetimes, cursor, unit)
+
+            rolling_rows = pd.DataFrame(
+                rolling_values, columns=ROLLING_COLUMNS)
+
+            # Bulk write of rolling returns
+            write_frame(cursor, "rolling_returns",
+                        ROLLING_COLUMNS, rolling_rows, key=ROLLING_KEY)
+        INGEST_ROWS.inc(len(rolling_rows), table="rolling_returns", unit=unit)
+
+        # The daily and weekly rollups served to charts are refreshed from the first bucket touched by the new entries,
+        # within the same transaction so they are committed together with the entries
+        if len(prices) > 0:
+            with INGEST_STAGE_SECONDS.time(stage="rollups", unit=unit):
+                refresh_rollups(cursor, unit, prices["datetime"].min())
+
+    '''
+    Function Description: Function utilized to ingest a single unit, from fetching its klines to committing its entries and rolling returns.
+                          Each unit is committed in its own transaction on its own connection, hence a failing unit is rolled back 
+                          without affecting the other units. The klines are fetched before a connection is checked out of the pool 
+                          so no connection is held while waiting on the Binance API.
+    @param unit => crypto unit to be ingested
+    @param start_date => datetime object of the lastest entry found in the database for the unit
+    @param process_pool => Optional executor the interpolation is submitted to, interpolation is executed in the calling thread otherwise
+    @param klines => Optional list of klines prefetched for the unit, klines are fetched with the Binance client otherwise
+    @param klines_closed => True if every kline is known to be closed, e.g. klines received from the kline stream, otherwise the 
+                            latest kline is skipped while its hour has not yet ended
+    @return DataFrame => Dataframe containing the committed price data of the unit, None if the unit failed
+    '''
+
+    def ingest_unit(self, unit, start_date, process_pool=None, klines=None, klines_closed=False):
+        conn = None
         try:
-            units_last_entries = self.get_latest_entry(cursor)
+            if klines is None:
+                self.set_progress(unit, "fetching")
+                with INGEST_STAGE_SECONDS.time(stage="fetch", unit=unit):
+                    klines = self.fetch_klines(unit, start_date)
+            # The kline of the current hour is still open and is ingested once it has closed
+            if klines and not klines_closed and int(klines[-1][6]) >= time.time() * 1000:
+                klines = klines[:-1]
+
+            conn = self.connect()
+            if conn is None:
+                INGEST_FAILURES.inc(unit=unit)
+                self.set_progress(unit, "failed")
+                return None
+            cursor = conn.cursor()
+            self.set_progress(unit, "interpolating")
+            with INGEST_STAGE_SECONDS.time(stage="interpolate", unit=unit):
+                statistical_data = self.get_statistical_data(unit, cursor)
 
-            if units_last_entries != {}:
-                # fetching the hourly price entries and the rolling datetimes which will be utilized to calculated the
-                # rolling daily returns
-                prices, rolling_datetimes = self.get_and_interpolate(
-                    units_last_entries, cursor)
-
-                for unit in prices.keys():
-                    price = prices[unit]
-                    rows = price.to_numpy()
-                    cols = ','.join(list(price.columns))
-
-                    # It should be noted that all SQL statements are written as parameterised queries to prevent SQL injection attacks
-                    statement = "INSERT INTO entries(%s) values(%%s, %%s, %%s, %%s, CAST(%%s as BOOLEAN))" % (
-                        cols)
-
-                    # Bulk insert of entries to reduce network transfer cost and database load
-                    # this method provides significant performance benefits compared to iteratively
-                    # and repetitive calls to cursor to insert entries.
-                    cursor.executemany(statement, rows)
-
-                    # Individual calculation of daily returns using an iterative approach
-                    # This decision was employed to tie together with the automatic hourly updates,
-                    # As hourly updates would only consist of at most one daily entry at 00:00 at any time,
-                    # this will not be as performance intensive as compared to the initial bulk loading of data into the database.
-                    rolling_values = []
-                    for date in rolling_datetimes:
-                        rolling_open, rolling_close = self.get_rolling_profit(
-                            date, cursor, unit)
-                        rolling_values.append(
-                            [date, rolling_open, rolling_close, unit])
-
-                    rolling_rows = np.array(rolling_values)
-                    rolling_cols = ','.join(
-                        ["date", "opening", "closing", "unit"])
-
-                    rolling_statement = "INSERT INTO rolling_returns(%s) values(%%s, %%s, %%s, %%s)" % (
-                        rolling_cols)
-
-                    # Bulk insert of rolling returns
-                    cursor.executemany(rolling_statement, rolling_rows)
+                if process_pool is None:
+                    prices, rolling_datetimes = interpolate_klines(
+                        unit, start_date, klines, statistical_data)
+                else:
+                    prices, rolling_datetimes = process_pool.submit(
+                        interpolate_klines, unit, start_date, klines, statistical_data).result()
 
+            self.set_progress(unit, "writing")
+            self.write_prices(cursor, unit, prices, rolling_datetimes)
+            with INGEST_STAGE_SECONDS.time(stage="commit", unit=unit):
                 conn.commit()
+            INGEST_LAST_COMMIT.set(time.time(), unit=unit)
+            self.set_progress(unit, "done", latest=prices["datetime"].max().to_pydatetime() if len(prices) > 0 else None)
+            return prices
         except (Exception, psycopg2.DatabaseError) as error:
-            print(error)
+            print(unit + ": " + str(error))
+            INGEST_FAILURES.inc(unit=unit)
+            self.set_progress(unit, "failed")
             if conn:
                 conn.rollback()
+            return None
         finally:
-            # Close active connection to the database
+            # Return the active connection to the connection pool
             if conn:
-                conn.close()
+                self.release(conn)
+
+    '''
+    Function Description: A helper function utilized to execute work which writes entries as a single flight, holding run_lock for this 
+                          process and a session level advisory lock for any other process sharing the database. Work overlapping an 
+                          ingest of this or another process is skipped as the running ingest writes the same entries.
+    @param work => Function executed while holding both locks
+    @return object => Result of work, None if it was skipped or the advisory lock could not be acquired
+    '''
+
+    def run_single_flight(self, work):
+        if not self.run_lock.acquire(blocking=False):
+            INGEST_SKIPPED.inc()
+            print("Ingest already running, skipped")
+            return None
+        try:
+            conn = self.connect()
+            if conn is None:
+                return None
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", (INGEST_LOCK_ID,))
+                locked = cursor.fetchone()[0]
+                conn.commit()
+                if not locked:
+                    INGEST_SKIPPED.inc()
+                    print("Ingest running in another process, skipped")
+                    return None
+
+                try:
+                    return work()
+                finally:
+                    # The lock is released together with the session if the connection was lost
+                    if not conn.closed:
+                        cursor.execute("SELECT pg_advisory_unlock(%s)", (INGEST_LOCK_ID,))
+                        conn.commit()
+            except (Exception, psycopg2.DatabaseError) as error:
+                print(error)
+                return None
+            finally:
+                self.release(conn)
+        finally:
+            self.run_lock.release()
+
+    '''
+    Function Description: The main algorithm utilized to automatically populate the database with data scrapped from binance and 
+                          the daily returns calculated. This algorithm is utilized in both the hourly ingest and the start up ingest 
+                          which allow the database to be updated on an hourly basis and when the application first starts up. Units are 
+                          ingested concurrently by a bounded pool of INGEST_WORKERS threads, as fetching from the Binance API is I/O bound, 
+                          while the pandas interpolation is optionally executed by a pool of INGEST_PROCESSES worker processes. Each unit 
+                          commits independently and commit listeners are notified of every unit which was committed successfully.
+                          The duration of the run is recorded and the run is profiled when a sampling profiler is configured.
+                          Runs are single flight, see run_single_flight. The run is recorded as completed in last_run once every unit
+                          which could be ingested was brought up to date, so units failing on every run, e.g. a delisted symbol, are
+                          reported in failed_units rather than holding back the others. A run in which every unit failed is not recorded.
+    @return boolean => True if the run brought every unit up to date, False if any unit failed, None if the run was skipped
+    '''
+
+    def run(self):
+        def work():
+            with INGEST_RUN_SECONDS.time():
+                if self.profiler is None:
+                    results = self.ingest()
+                else:
+                    with self.profiler.profile("ingest"):
+                        results = self.ingest()
+            if results is None:
+                # The latest entries could not be read, hence no unit was brought up to date
+                self.failed_units = sorted(SCRAP_UNITS | self.progress.keys())
+                return False
+
+            self.failed_units = sorted(unit for unit, succeeded in results.items() if not succeeded)
+            if not results or any(results.values()):
+                self.last_run = datetime.now(timezone.utc)
+            return all(results.values())
+
+        return self.run_single_flight(work)
+
+    '''
+    Function Description: A helper function utilized to execute a single ingest run of every unit, called by run.
+    @return dictionary => Dictionary mapping every unit to True if it was committed and False if it failed, None if the latest entries
+                          could not be read
+    '''
+
+    def ingest(self):
+        conn = self.connect()
+        if conn is None:
+            return None
+        try:
+            cursor = conn.cursor()
+            units_last_entries = self.get_latest_entry(cursor)
+            self.ensure_partitions(cursor, units_last_entries.values())
+            conn.commit()
+        except (Exception, psycopg2.DatabaseError) as error:
+            print(error)
+            return None
+        finally:
+            # Return the active connection to the connection pool
+            self.release(conn)
+
+        for unit, start_date in units_last_entries.items():
+            self.set_progress(unit, "pending", latest=start_date)
+
+        # Units which could not be prefetched are skipped until the next run
+        results = {unit: True for unit in units_last_entries}
+        prefetched = self.prefetch_klines(units_last_entries)
+        if prefetched is not None:
+            for unit in units_last_entries.keys() - prefetched.keys():
+                self.set_progress(unit, "failed")
+                results[unit] = False
+            units_last_entries = {unit: start_date for unit, start_date in units_last_entries.items()
+                                  if unit in prefetched}
+
+        committed = {}
+        process_pool = ProcessPoolExecutor(
+            max_workers=self.processes) if self.processes > 0 else None
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as thread_pool:
+                futures = {}
+                for unit, start_date in units_last_entries.items():
+                    klines = prefetched[unit] if prefetched is not None else None
+                    future = thread_pool.submit(
+                        self.ingest_unit, unit, start_date, process_pool, klines)
+                    futures[future] = unit
+
+                for future in as_completed(futures):
+                    prices = future.result()
+                    if prices is None:
+                        results[futures[future]] = False
+                    elif len(prices) > 0:
+                        committed[futures[future]] = prices
+        finally:
+            if process_pool:
+                process_pool.shutdown()
+
+        if committed:
+            self.notify_commit(committed)
+        return results